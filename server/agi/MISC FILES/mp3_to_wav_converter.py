@@ -1,10 +1,203 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox
+"""
+Audio to WAV converter (8 kHz, mono, 16 bit PCM) for the Asterisk sound sets.
+
+Without arguments it opens the Tkinter window that converts one file per
+click. With --batch it runs headless over whole directory trees:
+
+    python mp3_to_wav_converter.py --batch "sounds in mp3 ONLY FOR BACKUP" --out ../var_sounds
+
+With several roots each one is mirrored under its own subdirectory of
+--out (named after the root), so equal relative paths do not overwrite
+each other; sources that would still end up in the same WAV are reported
+as failed.
+Files are converted on a process pool sized to the cores. A file is skipped
+when its WAV is up to date: newer than the source, or made from a source
+with the same hash (recorded in .wav_convert_state.json in the output
+root, so copies that only changed the mtime are not converted again).
+WAVs are written to a temporary file and renamed, and a JSON report of
+what was converted, skipped and failed is printed or written to --report.
+"""
 import subprocess
 import os
+import sys
+import json
+import time
+import hashlib
+
+STATE_NAME = '.wav_convert_state.json'
+
+def convert_file(input_file, output_file):
+    """
+    Convert input_file to an 8 kHz mono 16 bit WAV with ffmpeg. The WAV is
+    renamed into place only when ffmpeg succeeded. Raises FileNotFoundError
+    when ffmpeg is not installed and RuntimeError when it fails.
+    """
+    temp_file = f"{output_file}.{os.getpid()}.tmp"
+    try:
+        # Sample rate: 8000 Hz, Channels: mono, Format: PCM 16-bit
+        result = subprocess.run([
+            'ffmpeg', '-i', input_file,
+            '-ar', '8000',
+            '-ac', '1',
+            '-sample_fmt', 's16',
+            '-f', 'wav',
+            temp_file, '-y'
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            raise RuntimeError("FFmpeg conversion failed" + (f": {lines[-1]}" if lines else ""))
+        os.replace(temp_file, output_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def find_sources(roots, extensions):
+    """(source_root, relative_path) of every file with one of the extensions"""
+    sources = []
+    for root in roots:
+        if os.path.isfile(root):
+            sources.append((os.path.dirname(root) or '.', os.path.basename(root)))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower().lstrip('.') in extensions:
+                    sources.append((root, os.path.relpath(os.path.join(dirpath, filename), root)))
+    return sources
+
+def convert_job(input_file, output_file, recorded, force):
+    """
+    Worker for the batch mode. Returns (status, source_state, error) with
+    status "converted", "skipped" or "failed".
+    """
+    try:
+        st = os.stat(input_file)
+        source_state = {"mtime": st.st_mtime, "size": st.st_size}
+        if not force and os.path.exists(output_file):
+            if recorded and recorded.get("mtime") == st.st_mtime and recorded.get("size") == st.st_size:
+                return "skipped", recorded, None
+            if not recorded and os.path.getmtime(output_file) >= st.st_mtime:
+                return "skipped", dict(source_state, sha256=file_hash(input_file)), None
+            source_state["sha256"] = file_hash(input_file)
+            if recorded and recorded.get("sha256") == source_state["sha256"]:
+                return "skipped", source_state, None
+        else:
+            source_state["sha256"] = file_hash(input_file)
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        convert_file(input_file, output_file)
+        return "converted", source_state, None
+    except Exception as e:
+        return "failed", None, str(e)
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(path, state):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+def batch_convert(roots, out_dir=None, extensions=("mp3",), jobs=None, force=False):
+    """
+    Convert every matching file under roots. The tree is mirrored under
+    out_dir (under out_dir/<root name> when there are several roots), or
+    each WAV is written next to its source. Returns the report.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    started = time.time()
+    jobs = jobs or os.cpu_count() or 1
+    report = {"converted": [], "skipped": [], "failed": {}, "jobs": jobs}
+    states = {}
+    planned = []
+    # abspath of each WAV -> abspath of the source it is made from
+    outputs = {}
+    for source_root, relative in find_sources(roots, extensions):
+        input_file = os.path.join(source_root, relative)
+        target_root = out_dir or source_root
+        if out_dir and len(roots) > 1:
+            target_root = os.path.join(out_dir, os.path.basename(os.path.abspath(source_root)))
+        output_file = os.path.join(target_root, os.path.splitext(relative)[0] + '.wav')
+        if os.path.abspath(output_file) == os.path.abspath(input_file):
+            report["skipped"].append(input_file)
+            continue
+        source, target = os.path.abspath(input_file), os.path.abspath(output_file)
+        if target in outputs:
+            # Another source with the same WAV, or the same file given twice
+            if outputs[target] != source:
+                report["failed"][input_file] = f"{output_file} is already made from {outputs[target]}"
+            continue
+        outputs[target] = source
+        state_path = os.path.join(target_root, STATE_NAME)
+        if state_path not in states:
+            states[state_path] = load_state(state_path)
+        # Relative to the source root: the same key whether --out is used or not
+        key = relative
+        planned.append((input_file, output_file, state_path, key))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [(pool.submit(convert_job, input_file, output_file, states[state_path].get(key), force),
+                    input_file, state_path, key)
+                   for input_file, output_file, state_path, key in planned]
+        for future, input_file, state_path, key in futures:
+            status, source_state, error = future.result()
+            if status == "failed":
+                report["failed"][input_file] = error
+                continue
+            states[state_path][key] = source_state
+            report[status].append(input_file)
+
+    for state_path, state in states.items():
+        if os.path.isdir(os.path.dirname(state_path) or '.'):
+            save_state(state_path, state)
+    report["seconds"] = round(time.time() - started, 2)
+    return report
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert audio files to 8 kHz mono 16 bit WAV")
+    parser.add_argument('--batch', nargs='+', metavar='PATH', help="files or directory trees to convert headless")
+    parser.add_argument('--out', help="output root, the source tree is mirrored (default: next to the sources)")
+    parser.add_argument('--ext', default='mp3', help="comma separated source extensions (default: mp3)")
+    parser.add_argument('--jobs', type=int, help="worker processes (default: number of cores)")
+    parser.add_argument('--force', action='store_true', help="convert even when the WAV is up to date")
+    parser.add_argument('--report', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not args.batch:
+        run_gui()
+        return 0
+    extensions = tuple(ext.strip().lower().lstrip('.') for ext in args.ext.split(',') if ext.strip())
+    report = batch_convert(args.batch, args.out, extensions, args.jobs, args.force)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 1 if report["failed"] else 0
+
+def run_gui():
+    # Tkinter is only needed for the window, headless servers often lack it
+    import tkinter as tk
+    root = tk.Tk()
+    MP3toWAVConverter(root, tk)
+    root.mainloop()
 
 class MP3toWAVConverter:
-    def __init__(self, root):
+    def __init__(self, root, tk):
         self.root = root
         self.root.title("Audio to WAV Converter")
         self.root.geometry("450x280")
@@ -55,6 +248,7 @@ class MP3toWAVConverter:
         footer.pack(side='bottom', pady=10)
 
     def select_and_convert(self):
+        from tkinter import filedialog, messagebox
         # Select audio file
         input_file = filedialog.askopenfilename(
             title="Select audio file",
@@ -81,25 +275,13 @@ class MP3toWAVConverter:
         self.root.update()
 
         try:
-            # Convert using ffmpeg
-            # Sample rate: 8000 Hz, Channels: mono, Format: PCM 16-bit
-            result = subprocess.run([
-                'ffmpeg', '-i', input_file,
-                '-ar', '8000',
-                '-ac', '1',
-                '-sample_fmt', 's16',
-                output_file, '-y'
-            ], capture_output=True, text=True)
-
-            if result.returncode == 0:
-                self.status_label.config(
-                    text=f"✓ Success! Saved to: {os.path.basename(output_file)}",
-                    fg='#4CAF50'
-                )
-                messagebox.showinfo("Success",
-                                  f"Conversion complete!\n\nSaved to:\n{output_file}")
-            else:
-                raise Exception("FFmpeg conversion failed")
+            convert_file(input_file, output_file)
+            self.status_label.config(
+                text=f"✓ Success! Saved to: {os.path.basename(output_file)}",
+                fg='#4CAF50'
+            )
+            messagebox.showinfo("Success",
+                              f"Conversion complete!\n\nSaved to:\n{output_file}")
 
         except FileNotFoundError:
             self.status_label.config(text="✗ Error: FFmpeg not found", fg='#f44336')
@@ -112,6 +294,4 @@ class MP3toWAVConverter:
             self.select_btn.config(state='normal')
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = MP3toWAVConverter(root)
-    root.mainloop()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the server/usr_local_bin entry points.
+
+Every script is copied into a scratch directory (the same flat layout as
+/usr/local/bin), its service URLs and config path are pointed at the local
+stub server from stub_servers.py, and it is then started as a fresh process
+several times. For each script we record:
+  - median / min wall time of a full run
+  - peak RSS (ru_maxrss of the child)
+  - an -X importtime breakdown (cumulative time of the top-level imports)
+
+Only the entry points listed in FIXTURES are benchmarked; library modules
+have nothing to measure on their own. Results are compared to a stored
+baseline and the run fails (exit code 1) when a script exits non-zero or
+got slower or bigger than the allowed budget.
+
+Usage:
+    python3 cold_start_bench.py                  # compare to baselines.json
+    python3 cold_start_bench.py --update-baseline
+    python3 cold_start_bench.py --only get_user.py validate.py --runs 20
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+from stub_servers import start_stub_server, make_wav
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "usr_local_bin")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines.json")
+
+# Hosts hardcoded in the scripts, all redirected to the stub server
+REWRITE_URLS = [
+    "https://maps.googleapis.com",
+    "https://speech.googleapis.com",
+    "https://texttospeech.googleapis.com",
+    "https://www.iqtaxi.com",
+    "http://188.245.212.246:2700",
+    "http://188.245.212.246:2322",
+    "http://188.245.212.246:221",
+]
+
+# Daemon sockets, cache and data files the scripts use
+LOCAL_STATE = [
+    "/run/agi-helper/helper.sock",
+    "/tmp/geocode_cache.sqlite",
+    "/tmp/caller_cache.sqlite",
+    "/tmp/provider_stats.sqlite",
+    "/tmp/tts_cache",
+    "/tmp/location_rules.marshal",
+    "/usr/local/bin/location_replacements.json",
+    "/tmp/special_places.marshal",
+    "/usr/local/bin/special_places.json",
+    "/usr/local/bin/service_areas.json",
+]
+
+EXTEN = "9999"
+CALLER = "6900000000"
+
+AGI_ENV = (
+    "agi_request: taxi_call_agi.py\n"
+    "agi_uniqueid: 1700000000.1\n"
+    f"agi_callerid: {CALLER}\n"
+    f"agi_extension: {EXTEN}\n"
+    "\n"
+)
+
+# Entry points started per call: script -> (argv, stdin). {dir} is the
+# scratch directory. Long-running servers (fastagi_server.py,
+# helper_daemon.py) are not cold-start entry points.
+FIXTURES = {
+    "taxi_call_agi.py": ([], AGI_ENV),
+    "check_config.py": ([EXTEN], None),
+    "check_json.py": (["name", '{"name": "Γιώργος"}'], None),
+    "extract_json_value.py": (['{"name": "Γιώργος", "latLng": {"lat": 37.9}}', "latLng.lat"], None),
+    "json_extractor.py": (["{dir}/progress.json", "pickupLocation.address", "1"], None),
+    "save_json.py": (["name", "Γιώργος", "{dir}/save/progress.json"], None),
+    "validate.py": (['{"address":"Ερμού 10","location_type":"ROOFTOP","latLng":{"lat":37.9,"lng":23.7}}'], None),
+    "get_user.py": ([EXTEN, CALLER], None),
+    "parse_date.py": ([EXTEN, "αύριο στις δέκα"], None),
+    "send_to_google_stt.py": ([EXTEN, "{dir}/recording.wav16"], None),
+    "send_to_google_tts.py": ([EXTEN, "Καλησπέρα", "{dir}/tts_out", "el-GR", "0", "wav"], None),
+    "send_to_stt.py": (["{dir}/recording.wav16"], None),
+    "stream_stt.py": ([EXTEN, "finish", "{dir}/recording.wav16"], None),
+    "tts_templates.py": (["render", EXTEN, "confirm", "{dir}/template_out", "el-GR", "0",
+                          "name=Γιώργος", "pickup=Ερμού 10", "destination=Πλατεία Συντάγματος"], None),
+    "fetch_latlng.py": (["{dir}/address.txt"], None),
+    "fetch_latlng_google.py": (["{dir}/address.txt"], None),
+    "fetch_latlng_google_v2.py": (["Πλατεία Συντάγματος"], None),
+    "fetch_latlng_google_v3.py": ([EXTEN, "1", "1", "Πλατεία Συντάγματος"], None),
+    "fetch_latlng_google_v4.py": ([EXTEN, "1", "1", "Πλατεία Συντάγματος"], None),
+    "fetch_latlng_google_v5.py": ([EXTEN, "1", "1", "Πλατεία Συντάγματος"], None),
+    "register_call.py": ([CALLER, "{dir}/name.txt", "{dir}/address.txt", "{dir}/latlng.txt",
+                          "{dir}/address.txt", "{dir}/latlng.txt"], None),
+    "register_call_v2.py": ([CALLER, "{dir}/name.txt", "{dir}/address.txt", "{dir}/latlng.txt",
+                             "{dir}/address.txt", "{dir}/latlng.txt"], None),
+    "register_call_v3.py": ([EXTEN, "{dir}/progress.json"], None),
+    "register_call_v4.py": ([EXTEN, "{dir}/progress.json"], None),
+    "register_call_v5.py": ([EXTEN, "{dir}/progress.json"], None),
+    "register_call_v6.py": ([EXTEN, "{dir}/progress.json", "bench-ref"], None),
+    "generate_analytics_v2.py": (["--help"], None),
+}
+
+def stage_scripts(stage_dir, base_url):
+    """Copy the scripts into stage_dir with URLs/paths pointed at the stubs"""
+    config_path = os.path.join(stage_dir, "config.json")
+    rewrites = [(url, base_url) for url in REWRITE_URLS]
+    rewrites.append(("/usr/local/bin/config.json", config_path))
+    # Sockets and caches live in the scratch directory too
+    for path in LOCAL_STATE:
+        rewrites.append((path, os.path.join(stage_dir, os.path.basename(path))))
+
+    for name in os.listdir(SCRIPTS_DIR):
+        source = os.path.join(SCRIPTS_DIR, name)
+        if not os.path.isfile(source):
+            continue
+        if name.endswith(".py"):
+            with open(source, "r", encoding="utf-8") as f:
+                text = f.read()
+            for old, new in rewrites:
+                text = text.replace(old, new)
+            with open(os.path.join(stage_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        elif name.endswith(".json"):
+            shutil.copy(source, os.path.join(stage_dir, name))
+
+    config = {
+        EXTEN: {
+            "name": "Bench",
+            "googleApiKey": "stub-key",
+            "clientToken": "stub-token",
+            "registerBaseUrl": base_url + "/IQTaxiApi",
+            "failCallTo": "SIP/1@stub",
+            "welcomePlayback": "custom/welcome-v2",
+            "daysValid": 7,
+        }
+    }
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    location = {"address": "Πλατεία Συντάγματος, Αθήνα", "latLng": {"lat": 37.9755, "lng": 23.7348}}
+    progress = {
+        "phone": CALLER,
+        "name": "Γιώργος",
+        "pickup": "Πλατεία Συντάγματος",
+        "pickupLocation": location,
+        "destination": "Ερμού 10",
+        "destinationLocation": location,
+    }
+    with open(os.path.join(stage_dir, "progress.json"), "w", encoding="utf-8") as f:
+        json.dump(progress, f, ensure_ascii=False)
+    for name, text in (("name.txt", "Γιώργος"), ("address.txt", "Πλατεία Συντάγματος"),
+                       ("latlng.txt", json.dumps(location["latLng"]))):
+        with open(os.path.join(stage_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+    with open(os.path.join(stage_dir, "recording.wav16"), "wb") as f:
+        f.write(make_wav(seconds=1.0, rate=16000))
+
+def list_scripts(only=None):
+    names = sorted(FIXTURES)
+    if only:
+        unknown = sorted(set(only) - set(FIXTURES))
+        if unknown:
+            raise SystemExit(f"No fixture for: {', '.join(unknown)}")
+        names = [n for n in names if n in only]
+    return names
+
+def fixture_for(name, stage_dir):
+    args, stdin = FIXTURES[name]
+    return [a.replace("{dir}", stage_dir) for a in args], stdin
+
+# Forks and execs the script, then reports wall time and the child's rusage.
+# Run as its own small interpreter because ru_maxrss also counts the memory
+# of the process that forked the child - a large parent would hide the script.
+SPAWN_HELPER = r"""
+import os, sys, time
+stdin_path, argv = sys.argv[1], sys.argv[2:]
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    try:
+        os.dup2(os.open(stdin_path or os.devnull, os.O_RDONLY), 0)
+        null = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(null, 1)
+        os.dup2(null, 2)
+        os.execv(argv[0], argv)
+    finally:
+        os._exit(127)
+_, status, usage = os.wait4(pid, 0)
+code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+print(time.perf_counter() - start, usage.ru_maxrss, code)
+"""
+
+def run_once(python, script, args, stdin_path, cwd):
+    """Start the script once. Returns (wall_seconds, peak_rss_kb, exit_code)"""
+    output = subprocess.run([python, "-S", "-c", SPAWN_HELPER, stdin_path or "", python, script] + args,
+                            cwd=cwd, stdout=subprocess.PIPE, check=True).stdout.split()
+    return float(output[0]), int(output[1]), int(output[2])
+
+def import_breakdown(python, script, args, stdin_text, cwd, top=8):
+    """Run once with -X importtime. Returns (total_ms, [(module, cumulative_ms), ...])"""
+    proc = subprocess.run([python, "-X", "importtime", script] + args, cwd=cwd,
+                          input=(stdin_text or "").encode("utf-8"),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    modules = []
+    for line in proc.stderr.decode("utf-8", "replace").splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|", 2)
+        except ValueError:
+            continue
+        # Only top-level imports, nested ones are indented further
+        name = name[1:]
+        if not name.startswith(" "):
+            modules.append((name.strip(), int(cumulative) / 1000.0))
+    total = sum(ms for _, ms in modules)
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return total, modules[:top]
+
+def bench_script(python, name, stage_dir, runs):
+    args, stdin_text = fixture_for(name, stage_dir)
+    stdin_path = None
+    if stdin_text is not None:
+        stdin_path = os.path.join(stage_dir, f".{name}.stdin")
+        with open(stdin_path, "w", encoding="utf-8") as f:
+            f.write(stdin_text)
+
+    script = os.path.join(stage_dir, name)
+    # Warm-up run (page cache, __pycache__ of shared modules)
+    run_once(python, script, args, stdin_path, stage_dir)
+
+    walls, rss, codes = [], [], set()
+    for _ in range(runs):
+        wall, peak_kb, code = run_once(python, script, args, stdin_path, stage_dir)
+        walls.append(wall * 1000.0)
+        rss.append(peak_kb)
+        codes.add(code)
+
+    import_ms, top_imports = import_breakdown(python, script, args, stdin_text, stage_dir)
+    return {
+        "wall_ms": round(statistics.median(walls), 2),
+        "wall_min_ms": round(min(walls), 2),
+        "rss_kb": max(rss),
+        "import_ms": round(import_ms, 2),
+        "top_imports": [[m, round(ms, 2)] for m, ms in top_imports],
+        "exit_codes": sorted(codes),
+    }
+
+def compare(results, baseline, budget, rss_budget, min_ms):
+    """Returns a list of regression messages, a script that exited non-zero is one"""
+    failures = []
+    for name, result in results.items():
+        if failed_run(result):
+            failures.append(f"{name}: exit codes {result['exit_codes']}, the timings measure a failed run")
+            continue
+        base = baseline.get(name)
+        if not base:
+            continue
+        allowed_wall = max(base["wall_ms"] * (1 + budget), base["wall_ms"] + min_ms)
+        if result["wall_ms"] > allowed_wall:
+            failures.append(f"{name}: wall {result['wall_ms']:.1f} ms > budget {allowed_wall:.1f} ms "
+                            f"(baseline {base['wall_ms']:.1f} ms)")
+        allowed_rss = base["rss_kb"] * (1 + rss_budget)
+        if result["rss_kb"] > allowed_rss:
+            failures.append(f"{name}: RSS {result['rss_kb']} KB > budget {allowed_rss:.0f} KB "
+                            f"(baseline {base['rss_kb']} KB)")
+    return failures
+
+def failed_run(result):
+    return any(code != 0 for code in result["exit_codes"])
+
+def print_table(results, baseline):
+    print(f"{'script':<28} {'wall ms':>9} {'base':>9} {'min ms':>8} {'RSS KB':>8} {'import ms':>10}  top imports")
+    for name, r in results.items():
+        base = baseline.get(name, {}).get("wall_ms")
+        base_text = f"{base:.1f}" if base is not None else "-"
+        top = ", ".join(f"{m} {ms:.1f}" for m, ms in r["top_imports"][:3])
+        failed = f"  FAILED (exit {r['exit_codes']})" if failed_run(r) else ""
+        print(f"{name:<28} {r['wall_ms']:>9.1f} {base_text:>9} {r['wall_min_ms']:>8.1f} "
+              f"{r['rss_kb']:>8} {r['import_ms']:>10.1f}  {top}{failed}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for usr_local_bin scripts")
+    parser.add_argument("--runs", type=int, default=7, help="timed runs per script")
+    parser.add_argument("--only", nargs="*", help="benchmark only these scripts")
+    parser.add_argument("--python", default=sys.executable, help="interpreter to benchmark with")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--budget", type=float, default=0.20, help="allowed wall time regression (0.20 = 20%%)")
+    parser.add_argument("--rss-budget", type=float, default=0.15, help="allowed peak RSS regression")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="ignore wall regressions smaller than this")
+    parser.add_argument("--json", help="also write the full results to this file")
+    args = parser.parse_args()
+
+    baseline_doc = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline_doc = json.load(f)
+    baseline = baseline_doc.get("scripts", {})
+
+    server, base_url = start_stub_server()
+    stage_dir = tempfile.mkdtemp(prefix="cold_start_bench_")
+    try:
+        stage_scripts(stage_dir, base_url)
+        results = {}
+        for name in list_scripts(args.only):
+            results[name] = bench_script(args.python, name, stage_dir, args.runs)
+    finally:
+        server.shutdown()
+        shutil.rmtree(stage_dir, ignore_errors=True)
+
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        scripts = dict(baseline)
+        failed = [name for name, r in results.items() if failed_run(r)]
+        if failed:
+            print(f"\nNot recording failed runs: {', '.join(failed)}")
+        for name, r in results.items():
+            if name in failed:
+                continue
+            scripts[name] = {"wall_ms": r["wall_ms"], "rss_kb": r["rss_kb"], "import_ms": r["import_ms"]}
+        baseline_doc = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "scripts": scripts,
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_doc, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    failures = compare(results, baseline, args.budget, args.rss_budget, args.min_ms)
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    if not baseline:
+        print("\nNo baseline yet - run with --update-baseline to store one")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Startup cost of requests vs simple_http.
+
+Runs "import X; X.get(stub)" in fresh interpreters for both clients and
+prints the median wall time, so the saving per script start is visible.
+
+Usage: python3 http_client_bench.py [runs]
+"""
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+from stub_servers import start_stub_server
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "usr_local_bin")
+
+SNIPPET = "import {module}; {module}.get('{url}/maps/api/geocode/json', params={{'address': 'x'}}, timeout=5).json()"
+
+def time_snippet(code, runs):
+    env = dict(os.environ, PYTHONPATH=SCRIPTS_DIR)
+    walls = []
+    for _ in range(runs + 1):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        walls.append((time.perf_counter() - start) * 1000.0)
+        if proc.returncode != 0:
+            return None, proc.stderr.decode("utf-8", "replace").strip().splitlines()[-1]
+    # First run only warms the page cache
+    return statistics.median(walls[1:]), None
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    server, base_url = start_stub_server()
+    try:
+        baseline, _ = time_snippet("pass", runs)
+        print(f"{'interpreter only':<18} {baseline:8.1f} ms")
+        for module in ("requests", "simple_http"):
+            wall, error = time_snippet(SNIPPET.format(module=module, url=base_url), runs)
+            if error:
+                print(f"{module:<18} {'n/a':>8}    ({error})")
+            else:
+                print(f"{module:<18} {wall:8.1f} ms  (+{wall - baseline:.1f} ms over bare start)")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
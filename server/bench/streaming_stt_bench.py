@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Time from end of recording to transcript, batch vs streaming STT.
+
+A recording is written to disk in real time the way Record() writes it
+(header first, then 20 ms of audio at a time). Batch mode then trims,
+encodes and uploads the finished file like send_to_google_stt.py; streaming
+mode follows the file with stream_stt.py while it is written. Both post to
+the stub server with the uplink throttled to --uplink-kbps.
+
+Usage: python3 streaming_stt_bench.py [wav_file] [--runs N] [--uplink-kbps KBPS]
+"""
+import os
+import sys
+import json
+import time
+import wave
+import base64
+import struct
+import argparse
+import tempfile
+import threading
+import statistics
+
+from stub_servers import start_stub_server
+from stt_encoding_bench import SCRIPTS_DIR, synthetic_recording
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+import simple_http
+import stream_stt
+from audio_trim import load_for_stt
+from audio_encode import encode_for_stt
+
+FRAME_SECONDS = 0.02
+
+def write_like_record(source, target):
+    """Copy source to target at real-time speed, header first"""
+    with wave.open(source, 'rb') as w:
+        rate = w.getframerate()
+        pcm = w.readframes(w.getnframes())
+    frame_bytes = int(rate * FRAME_SECONDS) * 2
+    with open(target, 'wb') as out:
+        with wave.open(out, 'wb') as header:
+            header.setnchannels(1)
+            header.setsampwidth(2)
+            header.setframerate(rate)
+            header.writeframes(b'')
+        out.flush()
+        started = time.perf_counter()
+        for index, offset in enumerate(range(0, len(pcm), frame_bytes)):
+            out.write(pcm[offset:offset + frame_bytes])
+            out.flush()
+            delay = started + (index + 1) * FRAME_SECONDS - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        # Sizes in the header are filled in when the recording is closed
+        out.seek(4)
+        out.write(struct.pack('<I', 36 + len(pcm)))
+        out.seek(40)
+        out.write(struct.pack('<I', len(pcm)))
+
+def batch(base_url, source, target):
+    write_like_record(source, target)
+    stopped = time.perf_counter()
+    audio_bytes, _ = load_for_stt(target, {})
+    audio_bytes, audio_config = encode_for_stt(audio_bytes, {})
+    config = dict(audio_config, languageCode="el-GR", profanityFilter=True)
+    body = json.dumps({"config": config, "audio": {"content": base64.b64encode(audio_bytes).decode("utf-8")}})
+    simple_http.post(f"{base_url}/v1/speech:recognize?key=stub-key",
+                     headers={"Content-Type": "application/json"}, data=body, timeout=120).json()
+    return (time.perf_counter() - stopped) * 1000.0
+
+def streaming(base_url, source, target):
+    done = threading.Event()
+    result = {}
+
+    def run():
+        result['text'] = stream_stt.stream_file(f"{base_url}/stt/stream", target, done.is_set, timeout=120)
+        result['finished'] = time.perf_counter()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    write_like_record(source, target)
+    stopped = time.perf_counter()
+    done.set()
+    thread.join()
+    return (result['finished'] - stopped) * 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare batch and streaming STT latency')
+    parser.add_argument('wav_file', nargs='?')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--uplink-kbps', type=float, default=256.0)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="streaming_stt_bench_")
+    source = args.wav_file
+    if not source:
+        source = os.path.join(work_dir, "source.wav")
+        synthetic_recording(source)
+
+    server, base_url = start_stub_server(upload_kbps=args.uplink_kbps)
+    print(f"{os.path.basename(source)}, uplink {args.uplink_kbps:g} kbit/s, "
+          f"ms from end of recording to transcript (median of {args.runs})")
+    try:
+        for name, mode in (("batch", batch), ("streaming", streaming)):
+            timings = []
+            for run in range(args.runs):
+                target = os.path.join(work_dir, f"{name}_{run}.wav16")
+                timings.append(mode(base_url, source, target))
+            print(f"{name:<10} {statistics.median(timings):8.1f}")
+    finally:
+        server.shutdown()
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Payload size and upload latency of the STT encodings.
+
+Encodes a recording as LINEAR16, FLAC and OGG_OPUS with audio_encode.py,
+builds the same JSON body send_to_google_stt.py sends and posts it to the
+stub recognizer, which reads request bodies at --uplink-kbps to stand in
+for the evening uplink. Prints the body size, encode time and median
+end-to-end time per encoding.
+
+Without a recording a synthetic voiced signal is used; real recordings
+compress differently, so pass one from /tmp/auto_register_call when you can.
+
+Usage: python3 stt_encoding_bench.py [wav_file] [--runs N] [--uplink-kbps KBPS]
+"""
+import os
+import sys
+import json
+import math
+import time
+import wave
+import base64
+import random
+import argparse
+import statistics
+
+from stub_servers import start_stub_server
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "usr_local_bin")
+sys.path.insert(0, SCRIPTS_DIR)
+
+import simple_http
+import audio_encode
+
+def synthetic_recording(path, seconds=4.0, rate=16000):
+    """Mono 16-bit WAV with syllable-like harmonic bursts over a noise floor"""
+    rng = random.Random(1)
+    frames = bytearray()
+    for n in range(int(seconds * rate)):
+        t = n / rate
+        envelope = max(0.0, math.sin(2 * math.pi * 3 * t)) if 0.5 < t < seconds - 1.0 else 0.0
+        pitch = 140 + 30 * math.sin(2 * math.pi * 0.7 * t)
+        voice = sum(math.sin(2 * math.pi * pitch * k * t) / k for k in range(1, 6))
+        value = int(4000 * envelope * voice + rng.gauss(0, 40))
+        frames += max(-32768, min(32767, value)).to_bytes(2, 'little', signed=True)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(frames))
+
+def request_body(audio_bytes, audio_config):
+    recognition_config = dict(audio_config)
+    recognition_config.update({"languageCode": "el-GR", "profanityFilter": True})
+    return json.dumps({
+        "config": recognition_config,
+        "audio": {"content": base64.b64encode(audio_bytes).decode("utf-8")}
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare STT upload encodings')
+    parser.add_argument('wav_file', nargs='?')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--uplink-kbps', type=float, default=1000.0)
+    args = parser.parse_args()
+
+    wav_file = args.wav_file
+    if not wav_file:
+        wav_file = f"/tmp/stt_encoding_bench_{os.getpid()}.wav"
+        synthetic_recording(wav_file)
+    with open(wav_file, 'rb') as f:
+        wav_bytes = f.read()
+    if audio_encode.soundfile is None:
+        print("soundfile is not installed, every codec falls back to LINEAR16", file=sys.stderr)
+
+    server, base_url = start_stub_server(upload_kbps=args.uplink_kbps)
+    url = f"{base_url}/v1/speech:recognize?key=stub-key"
+    print(f"{os.path.basename(wav_file)}: {len(wav_bytes)} bytes, uplink {args.uplink_kbps:g} kbit/s")
+    print(f"{'codec':<10} {'encoding':<10} {'audio B':>9} {'body B':>9} {'encode ms':>10} {'total ms':>9}")
+    try:
+        for codec in ("linear16", "flac", "ogg_opus"):
+            encode_ms, totals = [], []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                audio_bytes, audio_config = audio_encode.encode(wav_bytes, codec)
+                body = request_body(audio_bytes, audio_config)
+                encoded = time.perf_counter()
+                simple_http.post(url, headers={"Content-Type": "application/json"}, data=body, timeout=120).json()
+                finished = time.perf_counter()
+                encode_ms.append((encoded - start) * 1000.0)
+                totals.append((finished - start) * 1000.0)
+            print(f"{codec:<10} {audio_config['encoding']:<10} {len(audio_bytes):>9} {len(body):>9} "
+                  f"{statistics.median(encode_ms):>10.1f} {statistics.median(totals):>9.1f}")
+    finally:
+        server.shutdown()
+        if not args.wav_file:
+            os.remove(wav_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for every HTTP service the usr_local_bin scripts talk to.
+
+One ThreadingHTTPServer answers the Google APIs (geocode, speech, tts),
+the IQTaxi dispatch API, the date recognizer and the self-hosted stt/tts/
+photon servers with small canned responses, so benchmarks measure our own
+code instead of the network. /stt/stream reads chunked uploads as they
+arrive and stands in for the streaming recognizer of stream_stt.py.
+
+Run standalone: python3 stub_servers.py [port]
+"""
+import io
+import sys
+import json
+import time
+import wave
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_wav(seconds=0.5, rate=8000):
+    """Silent mono 16-bit WAV used as canned audio"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b'\x00\x00' * int(seconds * rate))
+    return buffer.getvalue()
+
+STUB_WAV = make_wav()
+
+GEOCODE_RESPONSE = {
+    "status": "OK",
+    "results": [{
+        "formatted_address": "Πλατεία Συντάγματος, Αθήνα 105 63, Ελλάδα",
+        "geometry": {
+            "location": {"lat": 37.9755, "lng": 23.7348},
+            "location_type": "ROOFTOP"
+        }
+    }]
+}
+
+STT_RESPONSE = {"results": [{"alternatives": [{"transcript": "Πλατεία Συντάγματος"}]}]}
+
+USER_RESPONSE = {
+    "result": {"result": "SUCCESS", "resultCode": 0, "msg": ""},
+    "response": {
+        "callerName": "Γιώργος",
+        "doNotServe": False,
+        "mainAddresss": {"address": "Ερμού 10, Αθήνα", "comments": "", "lat": 37.976, "lng": 23.729}
+    }
+}
+
+REGISTER_RESPONSE = {"result": {"result": "SUCCESS", "resultCode": 0, "msg": "OK"}, "response": {"id": 1}}
+
+DATE_RESPONSE = {"bestMatch": {"value": "2025-01-01T12:00:00"}}
+
+PHOTON_RESPONSE = {"features": [{"geometry": {"coordinates": [23.7348, 37.9755]}, "properties": {"name": "Σύνταγμα"}}]}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Request bodies are read at this rate when set, like a slow uplink
+    upload_bytes_per_second = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return b""
+        if not self.upload_bytes_per_second:
+            return self.rfile.read(length)
+        chunks = []
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 4096))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            time.sleep(len(chunk) / self.upload_bytes_per_second)
+        return b"".join(chunks)
+
+    def route(self):
+        path = self.path.split('?', 1)[0]
+        if path.startswith("/maps/api/geocode/json"):
+            return self.send_body(GEOCODE_RESPONSE)
+        if path.startswith("/v1/speech:recognize"):
+            return self.send_body(STT_RESPONSE)
+        if path.startswith("/v1/text:synthesize"):
+            return self.send_body({"audioContent": base64.b64encode(STUB_WAV).decode('ascii')})
+        if "/api/Calls/checkCallerID/" in path:
+            return self.send_body(USER_RESPONSE)
+        if "/api/Calls/RegisterNoLogin" in path:
+            return self.send_body(REGISTER_RESPONSE)
+        if "/Recognize/Date" in path:
+            return self.send_body(DATE_RESPONSE)
+        if path.startswith("/stt/stream"):
+            # Streaming stand-in: the body was consumed chunk by chunk as it arrived
+            return self.send_body({"text": "Πλατεία Συντάγματος", "bytes": self.body_bytes})
+        if path.startswith("/stt"):
+            return self.send_body({"text": "Πλατεία Συντάγματος"})
+        if path.startswith("/tts"):
+            return self.send_body(STUB_WAV, "audio/wav")
+        if path.startswith("/api"):
+            return self.send_body(PHOTON_RESPONSE)
+        return self.send_body({})
+
+    def do_GET(self):
+        self.route()
+
+    def do_POST(self):
+        self.body_bytes = len(self.read_body())
+        self.route()
+
+def start_stub_server(port=0, upload_kbps=None):
+    """
+    Start the stub server on a background thread. Returns (server, base_url).
+    upload_kbps throttles how fast request bodies are read.
+    """
+    handler = StubHandler
+    if upload_kbps:
+        handler = type("ThrottledStubHandler", (StubHandler,),
+                       {"upload_bytes_per_second": upload_kbps * 1000 / 8.0})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 18080
+    server, base_url = start_stub_server(port)
+    print(f"Stub services on {base_url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
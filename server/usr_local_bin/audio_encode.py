@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compression of recordings before they are uploaded to Google STT.
+
+The .wav16 recordings are 16 bit PCM, which base64 makes a third bigger
+again. FLAC is lossless and usually halves the upload; OGG_OPUS is lossy
+and much smaller still. Encoding happens in-process with soundfile
+(libsndfile); without it, or when encoding fails, the WAV is sent as
+LINEAR16 like before.
+
+Usage: python3 audio_encode.py <wav_file> [flac|ogg_opus|linear16]
+"""
+import io
+import sys
+import json
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    # OSError: the module is there but libsndfile is missing
+    soundfile = None
+
+DEFAULT_CODEC = "flac"
+
+# codec setting -> (soundfile format, subtype, Google encoding)
+CODECS = {
+    "flac": ("FLAC", "PCM_16", "FLAC"),
+    "ogg_opus": ("OGG", "OPUS", "OGG_OPUS"),
+}
+
+# Rates Google accepts for OGG_OPUS
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+def linear16(wav_bytes, rate=16000):
+    return wav_bytes, {"encoding": "LINEAR16", "sampleRateHertz": rate}
+
+def encode(wav_bytes, codec=DEFAULT_CODEC):
+    """
+    Returns (audio_bytes, audio_config) where audio_config holds the
+    "encoding" and "sampleRateHertz" fields of the recognition config.
+    """
+    codec = (codec or "linear16").lower()
+    if soundfile is None or codec not in CODECS:
+        return linear16(wav_bytes)
+    file_format, subtype, encoding = CODECS[codec]
+    try:
+        samples, rate = soundfile.read(io.BytesIO(wav_bytes), dtype='int16')
+        if codec == "ogg_opus" and rate not in OPUS_RATES:
+            return linear16(wav_bytes, rate)
+        buffer = io.BytesIO()
+        soundfile.write(buffer, samples, rate, format=file_format, subtype=subtype)
+        return buffer.getvalue(), {"encoding": encoding, "sampleRateHertz": rate}
+    except (RuntimeError, ValueError, TypeError):
+        # soundfile.LibsndfileError is a RuntimeError
+        return linear16(wav_bytes)
+
+def encode_for_stt(wav_bytes, extension_config=None):
+    """Encode with the codec chosen by the optional sttEncoding setting"""
+    codec = (extension_config or {}).get('sttEncoding', DEFAULT_CODEC)
+    return encode(wav_bytes, codec)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python audio_encode.py <wav_file> [flac|ogg_opus|linear16]", file=sys.stderr)
+        sys.exit(1)
+    with open(sys.argv[1], 'rb') as f:
+        wav_bytes = f.read()
+    audio_bytes, audio_config = encode(wav_bytes, sys.argv[2] if len(sys.argv) == 3 else DEFAULT_CODEC)
+    print(json.dumps(dict(audio_config, originalBytes=len(wav_bytes), encodedBytes=len(audio_bytes))))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Energy based silence trimming for the .wav16 recordings sent to STT.
+
+Record() keeps listening until 2 seconds of silence, so every recording
+ends (and often starts) with silence that is uploaded and billed for
+nothing. The recording is cut into 20 ms frames, the noise floor is taken
+from the quietest frames and anything a margin above it counts as voice.
+Leading and trailing silence is cut (keeping some padding) and, when
+asked, internal pauses longer than collapse_ms are shortened.
+
+Needs NumPy; without it load_for_stt returns the recording unchanged.
+
+Usage: python3 audio_trim.py <wav_file> [out_file] [--collapse MS]
+"""
+import io
+import sys
+import json
+import wave
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FRAME_MS = 20
+DEFAULT_PAD_MS = 200
+DEFAULT_MARGIN_DB = 10.0
+# Frames below this RMS are silence whatever the noise floor (16 bit scale)
+MIN_VOICE_RMS = 150.0
+NOISE_PERCENTILE = 10
+
+def frame_rms(samples, frame_len):
+    frames = len(samples) // frame_len
+    if frames == 0:
+        return np.zeros(0)
+    blocks = samples[:frames * frame_len].astype(np.float64).reshape(frames, frame_len)
+    return np.sqrt((blocks * blocks).mean(axis=1))
+
+def voiced_frames(rms, margin_db=DEFAULT_MARGIN_DB):
+    noise_floor = np.percentile(rms, NOISE_PERCENTILE)
+    threshold = max(noise_floor * 10 ** (margin_db / 20.0), MIN_VOICE_RMS)
+    return rms > threshold
+
+def trim_samples(samples, rate, pad_ms=DEFAULT_PAD_MS, collapse_ms=0, margin_db=DEFAULT_MARGIN_DB):
+    """
+    Return the samples to keep. Recordings without any voiced frame are
+    returned as they are so STT still gets to decide.
+    """
+    frame_len = rate * FRAME_MS // 1000
+    rms = frame_rms(samples, frame_len)
+    if len(rms) == 0:
+        return samples
+    voiced = voiced_frames(rms, margin_db)
+    indexes = np.flatnonzero(voiced)
+    if len(indexes) == 0:
+        return samples
+
+    pad_frames = pad_ms // FRAME_MS
+    first = max(0, indexes[0] - pad_frames)
+    last = min(len(rms), indexes[-1] + 1 + pad_frames)
+    keep = np.zeros(len(samples), dtype=bool)
+    keep[first * frame_len:last * frame_len] = True
+    if last == len(rms):
+        # The partial frame at the end belongs to the kept region
+        keep[last * frame_len:] = True
+
+    if collapse_ms:
+        collapse_frames = max(1, collapse_ms // FRAME_MS)
+        # Gaps between consecutive voiced frames longer than collapse_frames
+        gaps = np.flatnonzero(np.diff(indexes) > collapse_frames + 1)
+        for gap in gaps:
+            start = indexes[gap] + 1
+            end = indexes[gap + 1]
+            half = collapse_frames // 2
+            keep[(start + half) * frame_len:(end - (collapse_frames - half)) * frame_len] = False
+
+    return samples[keep]
+
+def to_wav_bytes(samples, rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(samples.astype('<i2').tobytes())
+    return buffer.getvalue()
+
+def trim_wav(wav_bytes, pad_ms=DEFAULT_PAD_MS, collapse_ms=0, margin_db=DEFAULT_MARGIN_DB):
+    """
+    Trim a 16 bit mono WAV. Returns (wav_bytes, stats); other formats are
+    returned unchanged with stats None.
+    """
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as source:
+        if source.getnchannels() != 1 or source.getsampwidth() != 2:
+            return wav_bytes, None
+        rate = source.getframerate()
+        samples = np.frombuffer(source.readframes(source.getnframes()), dtype='<i2')
+
+    kept = trim_samples(samples, rate, pad_ms, collapse_ms, margin_db)
+    trimmed = to_wav_bytes(kept, rate)
+    stats = {
+        "originalMs": len(samples) * 1000 // rate,
+        "trimmedMs": len(kept) * 1000 // rate,
+        "originalBytes": len(wav_bytes),
+        "trimmedBytes": len(trimmed)
+    }
+    return trimmed, stats
+
+def trim_settings(extension_config):
+    """Optional sttTrim settings of an extension, None when trimming is off"""
+    settings = (extension_config or {}).get('sttTrim') or {}
+    if np is None or not settings.get('enabled', True):
+        return None
+    return {
+        "pad_ms": int(settings.get('padMs', DEFAULT_PAD_MS)),
+        "collapse_ms": int(settings.get('collapsePausesMs', 0)),
+        "margin_db": float(settings.get('marginDb', DEFAULT_MARGIN_DB))
+    }
+
+def load_for_stt(wav_file, extension_config=None):
+    """
+    Recording bytes to upload and the trimming stats (None when the file was
+    sent as recorded). A recording that cannot be parsed is sent as it is.
+    """
+    with open(wav_file, 'rb') as f:
+        wav_bytes = f.read()
+    settings = trim_settings(extension_config)
+    if settings is None:
+        return wav_bytes, None
+    try:
+        return trim_wav(wav_bytes, **settings)
+    except (wave.Error, EOFError, ValueError):
+        return wav_bytes, None
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    collapse_ms = 0
+    if '--collapse' in args:
+        position = args.index('--collapse')
+        collapse_ms = int(args[position + 1])
+        del args[position:position + 2]
+    if not args or len(args) > 2:
+        print("Usage: python audio_trim.py <wav_file> [out_file] [--collapse MS]", file=sys.stderr)
+        sys.exit(1)
+    if np is None:
+        print("NumPy is not installed", file=sys.stderr)
+        sys.exit(1)
+
+    with open(args[0], 'rb') as f:
+        trimmed, stats = trim_wav(f.read(), collapse_ms=collapse_ms)
+    if len(args) == 2:
+        with open(args[1], 'wb') as f:
+            f.write(trimmed)
+    print(json.dumps(stats))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Caller profile cache for get_user.py (checkCallerID results).
+
+SQLite file keyed by (extension, phone). The profile carries doNotServe,
+which the dispatch side can change at any moment, so a cached entry is
+never served on its own: get_user.py always asks the API, and for a known
+caller waits only fallbackTimeout seconds. The cached profile, block flag
+included, is used only when the API does not answer in time; the entry is
+then refetched in the background with the full timeout. The trade-off: the
+cache bounds the wait and covers outages of slow dispatch servers, but a
+caller whose server answers promptly gets no faster than without it, and
+during an outage a caller blocked or unblocked since the last fetch keeps
+the old flag. register_call_v6.py drops the entry when a registration
+changes the caller's main address. Any SQLite problem disables the cache
+for that call.
+
+Usage: python3 caller_cache.py [stats|clear|purge|invalidate <exten> <phone>]
+"""
+import sys
+import json
+import time
+import sqlite3
+
+CACHE_PATH = '/tmp/caller_cache.sqlite'
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+DEFAULT_FALLBACK_TIMEOUT = 5
+# A refresh that has not finished after this long may be started again
+REFRESH_LOCK = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS callers (
+    exten TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    refreshing REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (exten, phone)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+class CallerCache:
+    def __init__(self, path=CACHE_PATH, max_age=DEFAULT_MAX_AGE, fallback_timeout=DEFAULT_FALLBACK_TIMEOUT):
+        self.path = path
+        self.max_age = max_age
+        self.fallback_timeout = fallback_timeout
+        self.conn = None
+        try:
+            self.conn = sqlite3.connect(path, timeout=2)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+        except sqlite3.Error:
+            self.conn = None
+
+    @classmethod
+    def for_extension(cls, config, current_exten):
+        """Build a cache using the optional callerCache settings of the extension"""
+        settings = {}
+        if config and current_exten in config:
+            settings = config[current_exten].get('callerCache') or {}
+        return cls(max_age=float(settings.get('maxAgeDays', DEFAULT_MAX_AGE / 86400)) * 86400,
+                   fallback_timeout=float(settings.get('fallbackTimeout', DEFAULT_FALLBACK_TIMEOUT)))
+
+    def count(self, name):
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,))
+                self.conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+        except sqlite3.Error:
+            pass
+
+    def get(self, exten, phone):
+        """Return (profile, age_seconds) or None"""
+        if self.conn is None:
+            return None
+        try:
+            row = self.conn.execute(
+                "SELECT profile, fetched FROM callers WHERE exten = ? AND phone = ?",
+                (str(exten), str(phone))).fetchone()
+            if row is None:
+                return None
+            age = time.time() - row[1]
+            if age > self.max_age:
+                return None
+            return json.loads(row[0]), age
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def put(self, exten, phone, profile):
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO callers (exten, phone, profile, fetched, refreshing) VALUES (?, ?, ?, ?, 0)",
+                    (str(exten), str(phone), json.dumps(profile, ensure_ascii=False), time.time()))
+        except sqlite3.Error:
+            pass
+
+    def claim_refresh(self, exten, phone):
+        """True for the one caller that should refresh an entry the API did not answer for"""
+        if self.conn is None:
+            return False
+        now = time.time()
+        try:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "UPDATE callers SET refreshing = ? WHERE exten = ? AND phone = ? AND refreshing < ?",
+                    (now, str(exten), str(phone), now - REFRESH_LOCK))
+            return cursor.rowcount == 1
+        except sqlite3.Error:
+            return False
+
+    def invalidate(self, exten, phone):
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM callers WHERE exten = ? AND phone = ?", (str(exten), str(phone)))
+        except sqlite3.Error:
+            pass
+
+    def invalidate_if_address_changed(self, exten, phone, pickup, lat, lng):
+        """Drop the entry when a registered pickup differs from the cached main address"""
+        entry = self.get(exten, phone)
+        if entry is None:
+            return False
+        profile = entry[0]
+        cached_lat_lng = profile.get("latLng") or {}
+        same_address = (profile.get("pickup") == pickup and
+                        cached_lat_lng.get("lat") == lat and cached_lat_lng.get("lng") == lng)
+        if same_address:
+            return False
+        self.invalidate(exten, phone)
+        return True
+
+    def purge(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM callers WHERE fetched < ?", (time.time() - self.max_age,))
+
+    def stats(self):
+        if self.conn is None:
+            return {}
+        counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = self.conn.execute("SELECT COUNT(*) FROM callers").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": counters.get('hits', 0),
+            "misses": counters.get('misses', 0),
+            "fallbacks": counters.get('fallbacks', 0),
+            "refreshes": counters.get('refreshes', 0),
+        }
+
+    def clear(self):
+        if self.conn is None:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM callers")
+            self.conn.execute("DELETE FROM counters")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = CallerCache()
+    if cache.conn is None:
+        print(f"Cannot open cache at {CACHE_PATH}", file=sys.stderr)
+        sys.exit(1)
+    if command == "clear":
+        cache.clear()
+    elif command == "purge":
+        cache.purge()
+    elif command == "invalidate" and len(sys.argv) == 4:
+        cache.invalidate(sys.argv[2], sys.argv[3])
+    elif command != "stats":
+        print("Usage: python caller_cache.py [stats|clear|purge|invalidate <exten> <phone>]", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(cache.stats(), ensure_ascii=False))
@@ -5,25 +5,40 @@ import os
 
 CONFIG_PATH = "/usr/local/bin/config.json"
 
-def main():
-    if len(sys.argv) != 2:
-        print(0)
-        return
+# (mtime, config) - lets the helper daemon skip re-reading an unchanged file
+_config_cache = None
+
+def load_config():
+    global _config_cache
+    mtime = os.path.getmtime(CONFIG_PATH)
+    if _config_cache is None or _config_cache[0] != mtime:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            _config_cache = (mtime, json.load(f))
+    return _config_cache[1]
+
+def run(args):
+    """Script entry point without side effects on stdout. Returns (stdout, stderr, exit_code)"""
+    if len(args) != 1:
+        return "0\n", "", 0
 
-    exten = sys.argv[1]
+    exten = args[0]
 
     if not os.path.isfile(CONFIG_PATH):
-        print(0)
-        return
+        return "0\n", "", 0
 
     try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        print(1 if exten in config else 0)
+        config = load_config()
+        return ("1\n" if exten in config else "0\n"), "", 0
 
     except Exception:
-        print(0)
+        return "0\n", "", 0
+
+def main():
+    import helper_client
+    result = helper_client.call("check_config", sys.argv[1:])
+    if result is None:
+        result = run(sys.argv[1:])
+    helper_client.emit(result)
 
 if __name__ == "__main__":
     main()
@@ -2,6 +2,8 @@
 import json
 import sys
 
+from json_extractor import extract_many, format_batch
+
 def get_nested_value(data, path):
     try:
         for key in path.split('.'):
@@ -13,18 +15,33 @@ def get_nested_value(data, path):
     except Exception:
         return ""
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("")  # Empty output if usage is incorrect
-        sys.exit(0)
+def run(args):
+    """Script entry point without side effects on stdout. Returns (stdout, stderr, exit_code)"""
+    if args and args[0] in ("--batch", "--array"):
+        # extract_json_value.py --array '<json>' name pickup latLng.lat ...
+        # Every path is read from one parse of the JSON, see json_extractor.parse_batch_spec
+        try:
+            data = json.loads(args[1]) if len(args) > 1 else {}
+        except Exception:
+            data = {}
+        return format_batch(extract_many(data, args[2:]), array=(args[0] == "--array")), "", 0
 
-    json_input = sys.argv[1]
-    key_path = sys.argv[2]  # e.g. "name", "pickup", "pickupLocation.latLng.lat"
+    if len(args) != 2:
+        return "\n", "", 0  # Empty output if usage is incorrect
+
+    json_input = args[0]
+    key_path = args[1]  # e.g. "name", "pickup", "pickupLocation.latLng.lat"
 
     try:
         data = json.loads(json_input)
         value = get_nested_value(data, key_path)
-        print(value)
+        return f"{value}\n", "", 0
     except Exception:
-        print("")
+        return "\n", "", 0
 
+if __name__ == "__main__":
+    import helper_client
+    result = helper_client.call("extract_json_value", sys.argv[1:])
+    if result is None:
+        result = run(sys.argv[1:])
+    helper_client.emit(result)
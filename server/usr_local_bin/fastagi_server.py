@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Long-running FastAGI server for TaxiCallAGI.
+
+Instead of Asterisk spawning taxi_call_agi.py for every call, this process
+stays up and handles each call on a worker thread. Config, logging and the
+HTTP sessions stay warm between calls.
+
+Dialplan:
+    same => n,AGI(agi://127.0.0.1:4573)
+
+The same port also serves the helper_daemon.py operations without forking a
+process. The result lands in HELPER_RESULT (stdout without the trailing
+newline) and HELPER_CODE. An argument var:NAME is replaced by the value of
+the channel variable NAME, so JSON and free text with commas or quotes get
+through AGI() unharmed; trailing empty arguments are dropped. The dialplan
+reaches it through the agi-helper subroutine in extensions_custom.conf:
+    same => n,AGI(agi://127.0.0.1:4573/helper,validate,var:NAME_RESULT)
+
+Usage: python3 fastagi_server.py [host] [port] [workers]
+SIGHUP reloads /usr/local/bin/config.json without dropping active calls.
+"""
+import sys
+import io
+import json
+import base64
+import signal
+import logging
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from taxi_call_agi import TaxiCallAGI, read_agi_environment
+from helper_daemon import run_op
+
+CONFIG_PATH = '/usr/local/bin/config.json'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 4573
+DEFAULT_WORKERS = 32
+
+logging.basicConfig(
+    filename='/tmp/taxi_agi.log',
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s'
+)
+
+def load_config(filepath):
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"Failed to load config file {filepath}: {e}")
+        return {}
+
+def quote_agi_value(value):
+    """Quote a value for SET VARIABLE"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ') + '"'
+
+def helper_args(agi_vars):
+    """Collect agi_arg_1..N in order, without the empty ones at the end"""
+    args = []
+    index = 1
+    while f"agi_arg_{index}" in agi_vars:
+        args.append(agi_vars[f"agi_arg_{index}"])
+        index += 1
+    while args and args[-1] == "":
+        args.pop()
+    return args
+
+def parse_agi_value(response):
+    """Value of a "200 result=1 (value)" response, "" when the variable is not set"""
+    if not response.startswith("200 result=1"):
+        return ""
+    start, end = response.find("("), response.rfind(")")
+    return response[start + 1:end] if 0 <= start < end else ""
+
+class FastAGIHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        agi_in = io.TextIOWrapper(self.rfile, encoding='utf-8', newline='\n')
+        agi_out = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+        try:
+            agi_vars = read_agi_environment(agi_in)
+            if agi_vars.get('agi_network_script') == 'helper':
+                self.handle_helper(agi_vars, agi_in, agi_out)
+                return
+            agi = TaxiCallAGI(agi_in, agi_out,
+                              config=self.server.config,
+                              http=self.server.get_session(),
+                              agi_vars=agi_vars)
+            agi.run()
+        finally:
+            # Hand the raw streams back so StreamRequestHandler can close them
+            agi_in.detach()
+            agi_out.detach()
+
+    def read_variable(self, name, agi_in, agi_out):
+        """
+        Channel variable through GET FULL VARIABLE, base64 encoded by Asterisk
+        so newlines and parentheses in the value cannot break the response.
+        Returns None when the channel went away.
+        """
+        agi_out.write(f"GET FULL VARIABLE ${{BASE64_ENCODE(${{{name}}})}}\n")
+        agi_out.flush()
+        response = agi_in.readline()
+        if not response:
+            return None
+        value = parse_agi_value(response.strip())
+        return base64.b64decode(value).decode("utf-8", "replace") if value else ""
+
+    def handle_helper(self, agi_vars, agi_in, agi_out):
+        args = helper_args(agi_vars)
+        for index, arg in enumerate(args):
+            if arg.startswith("var:"):
+                value = self.read_variable(arg[len("var:"):], agi_in, agi_out)
+                if value is None:
+                    return
+                args[index] = value
+        if not args:
+            stdout, stderr, code = "", "Missing helper operation", 1
+        else:
+            stdout, stderr, code = run_op(args[0], args[1:])
+        if stderr:
+            logging.warning(f"helper {args}: {stderr.strip()}")
+        for name, value in (("HELPER_RESULT", stdout.rstrip("\n")), ("HELPER_CODE", str(code))):
+            agi_out.write(f"SET VARIABLE {name} {quote_agi_value(value)}\n")
+            agi_out.flush()
+            if not agi_in.readline():
+                return
+
+class FastAGIServer(socketserver.TCPServer):
+    allow_reuse_address = True
+
+    def __init__(self, address, workers=DEFAULT_WORKERS):
+        self.config = load_config(CONFIG_PATH)
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fastagi')
+        super().__init__(address, FastAGIHandler)
+
+    def get_session(self):
+        """One requests.Session per worker thread (keeps connections alive)"""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self.local.session = session
+        return session
+
+    def reload_config(self):
+        config = load_config(CONFIG_PATH)
+        if config:
+            # New calls pick up the new dict, running calls keep theirs
+            self.config = config
+            logging.info(f"Reloaded config ({len(config)} extensions)")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+def main():
+    host = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_HOST
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_WORKERS
+
+    server = FastAGIServer((host, port), workers)
+    signal.signal(signal.SIGHUP, lambda signum, frame: server.reload_config())
+    logging.info(f"FastAGI server listening on {host}:{port} with {workers} workers")
+    print(f"FastAGI server listening on {host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
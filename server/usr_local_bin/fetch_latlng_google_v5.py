@@ -1,19 +1,22 @@
 #!/usr/bin/env python3
 import sys
 import json
-import requests
-import unicodedata
-import re
+import simple_http
+from geocode_cache import GeocodeCache, normalize_query
+from location_rules import replace_locations
+from special_places import find_place
+from service_area import load_service_area, bounds_param, in_service_area
 
-# Location replacement lookup table
-# Add new mappings here as needed
-LOCATION_REPLACEMENTS = {
-    "Μπουρνάζι": "Χαλάνδρι",
-    "ΜΠΟΥΡΝΑΖΙ": "ΧΑΛΑΝΔΡΙ",
-    "Μπουρναζι": "Χαλάνδρι",
-    # Add more replacements as needed
-    # Format: "old_name": "new_name"
-}
+# Words that are never an address on their own (answers, greetings, fillers)
+NON_ADDRESS_WORDS = {normalize_query(word) for word in (
+    "ναι", "όχι", "εμπρός", "αλό", "λέγετε", "ορίστε", "μάλιστα", "εντάξει", "οκ",
+    "ευχαριστώ", "παρακαλώ", "καλημέρα", "καλησπέρα", "γεια", "σας", "ένα", "λεπτό",
+    "τι", "ποιος", "ποια", "εε", "εεε", "μμ", "ααα",
+    "hello", "yes", "no",
+)}
+
+# Google results the validator rejects anyway, cached only for a short while
+LOW_PRECISION_TYPES = ("APPROXIMATE", "GEOMETRIC_CENTER")
 
 def load_config(filepath):
     try:
@@ -22,133 +25,126 @@ def load_config(filepath):
     except:
         return None
 
-def remove_diacritics(text):
-    if not isinstance(text, str):
-        return text
-    normalized = unicodedata.normalize('NFD', text)
-    return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
-
-def replace_locations_in_address(address_query):
+def looks_like_address(text):
     """
-    Replace location names in the address based on the lookup table.
-    Returns the modified address and a boolean indicating if a replacement was made.
+    Cheap check that a transcript could be an address at all: it needs at
+    least three letters and one word that is not a filler like "ναι" or "εμπρός".
     """
-    modified_address = address_query
-    replacement_made = False
-    
-    # Check each replacement in the lookup table
-    for old_location, new_location in LOCATION_REPLACEMENTS.items():
-        # Use word boundaries to ensure we match whole words
-        # This prevents partial matches within larger words
-        pattern = r'\b' + re.escape(old_location) + r'\b'
-        
-        if re.search(pattern, modified_address, re.IGNORECASE):
-            # Replace all occurrences (case-insensitive)
-            modified_address = re.sub(pattern, new_location, modified_address, flags=re.IGNORECASE)
-            replacement_made = True
-            
-    return modified_address, replacement_made
+    normalized = normalize_query(text)
+    if sum(c.isalpha() for c in normalized) < 3:
+        return False
+    return any(word not in NON_ADDRESS_WORDS for word in normalized.split())
 
-def is_cosmos_extension(config, current_exten):
-    """Check if current extension name is 'Cosmos' (case insensitive)"""
-    if not config or current_exten not in config:
+def get_components(config, current_exten, area):
+    """Google components filter: geocodeComponents from config, else the service area's"""
+    if config and current_exten in config and config[current_exten].get('geocodeComponents'):
+        return config[current_exten]['geocodeComponents']
+    return area.get('components') if area else None
+
+def is_outside_area(result, area, pickup):
+    """Pickup results outside the service area are wrong matches, destinations may be anywhere"""
+    if pickup != "1" or not area:
         return False
-    extension_name = config[current_exten].get('name', '').lower()
-    return extension_name == 'cosmos'
+    lat_lng = result["latLng"]
+    return not in_service_area(area, lat_lng["lat"], lat_lng["lng"])
 
-def is_airport_query(address_query):
-    """Check if address query contains airport-related terms"""
-    # Remove diacritics and convert to lowercase for comparison
-    query_normalized = remove_diacritics(address_query.strip().lower())
+def geocode_google(search_address, api_key, area=None, components=None):
+    """
+    Geocode with the Google API. Returns (result, status) where result is
+    {"address", "location_type", "latLng"} for the first hit, or None when
+    nothing usable came back and status says why. area (service_area.py)
+    biases ambiguous names towards the extension's own region.
+    """
+    api_url = "https://maps.googleapis.com/maps/api/geocode/json"
+    params = {
+        "address": search_address,
+        "key": api_key,
+        "language": "el-GR"
+    }
+    if area:
+        params["bounds"] = bounds_param(area)
+    if components:
+        params["components"] = components
+    response = simple_http.get(api_url, params=params, timeout=15)
+    response.raise_for_status()
+    data = response.json()
     
-    # Airport-related terms (without diacritics for comparison)
-    airport_terms = [
-        'αεροδομιο', 'αεροδρόμιο', 'airport',
-    ]
+    status = data.get("status", "")
+    if status != "OK":
+        return None, status
+        
+    results = data.get("results", [])
+    if not results:
+        return None, "ZERO_RESULTS"
+        
+    location = results[0]["geometry"]["location"]
     
-    # Check if any airport term is in the query
-    for term in airport_terms:
-        if remove_diacritics(term.lower()) in query_normalized:
-            return True
-    return False
-
-def get_athens_airport_response():
-    """Return hardcoded Athens airport data"""
-    output = {
-        "address": "Αεροδρόμιο Αθηνών Ελευθέριος Βενιζέλος, Σπάτα",
-        "location_type": "ROOFTOP",
+    lat = location.get("lat")
+    lng = location.get("lng")
+    formatted_address = results[0].get("formatted_address", "")
+    
+    if lat is None or lng is None:
+        return None, "NO_LOCATION"
+    
+    return {
+        "address": str(formatted_address),
+        "location_type": str(results[0]["geometry"].get("location_type", "")),
         "latLng": {
-            "lat": 37.9363405,
-            "lng": 23.946668
+            "lat": float(lat),
+            "lng": float(lng)
         }
-    }
-    return json.dumps(output, ensure_ascii=False, separators=(',', ':'))
+    }, status
 
 def fetch_coordinates(address_query, api_key, force_check, pickup, config, current_exten):
     try:
-        # Apply location replacements if any match
-        modified_address, replacement_made = replace_locations_in_address(address_query)
+        # Apply the extension's location replacements (location_replacements.json)
+        modified_address, replacement_made = replace_locations(address_query, current_exten)
         
         # Use the modified address if a replacement was made
         search_address = modified_address if replacement_made else address_query
         
-        # Check for local center addresses (existing functionality)
-        if pickup == "0" and remove_diacritics(search_address.strip().lower()) in ["κεντρο", "τοπικο", "κεντρο αθηνα", "κεντρο θεσσαλονικη", "κεντρο πατρα", "κεντρο ηρακλειο", "κεντρο λαρισα"]:
-            output = {
-                "address": str(search_address),
-                "location_type": str("EXACT"),
-                "latLng": {
-                    "lat": float(0),
-                    "lng": float(0)
-                }
-            }
-            return json.dumps(output, ensure_ascii=False, separators=(',', ':'))
-        
-        # Check for airport queries if extension is Cosmos
-        if is_cosmos_extension(config, current_exten) and is_airport_query(search_address):
-            return get_athens_airport_response()
-        
-        # Original API call functionality with the potentially modified address
-        api_url = "https://maps.googleapis.com/maps/api/geocode/json"
-        params = {
-            "address": search_address,
-            "key": api_key,
-            "language": "el-GR"
-        }
-        response = requests.get(api_url, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+        # Registered places (airports, ports, "κέντρο" ...) need no geocoding
+        place = find_place(search_address, current_exten, config, pickup)
+        if place:
+            return json.dumps(place, ensure_ascii=False, separators=(',', ':'))
         
-        if data.get("status") != "OK":
+        cache = GeocodeCache.for_extension(config, current_exten)
+
+        # STT noise ("ναι", "εμπρός", half words) never geocodes, skip the request
+        if not looks_like_address(search_address):
+            cache.count_prefiltered()
             return ""
-            
-        results = data.get("results", [])
-        if not results:
+
+        # Same query failed recently for this extension
+        if cache.get_negative(current_exten, search_address):
             return ""
-            
-        location = results[0]["geometry"]["location"]
-        
-        lat = location.get("lat")
-        lng = location.get("lng")
-        formatted_address = results[0].get("formatted_address", "")
-        
-        if lat is None or lng is None:
+
+        # Pickups must fall inside the extension's service area (service_areas.json)
+        area = load_service_area(current_exten)
+
+        # Cached geocode (same extension + normalized query) or a live Google request
+        result = cache.get(current_exten, search_address)
+        if result is None:
+            result, status = geocode_google(search_address, api_key, area,
+                                            get_components(config, current_exten, area))
+            if result is None:
+                # Quota or key errors say nothing about the query, do not remember them
+                if status in ("ZERO_RESULTS", "NO_LOCATION"):
+                    cache.put_negative(current_exten, search_address, status)
+                return ""
+            # Cached even when outside the area: the same text is a valid destination
+            if result["location_type"] in LOW_PRECISION_TYPES:
+                cache.put(current_exten, search_address, result, ttl=cache.negative_ttl)
+            else:
+                cache.put(current_exten, search_address, result)
+        if is_outside_area(result, area, pickup):
             return ""
-            
-        location_type = ""
-        if force_check != "0":
-            location_type = str(results[0]["geometry"]["location_type"])
-        
-        # Create proper JSON object
-        output = {
-            "address": str(formatted_address),
-            "location_type": str(location_type),
-            "latLng": {
-                "lat": float(lat),
-                "lng": float(lng)
-            }
-        }
-        
+
+        # location_type is only reported when the caller asked for the check
+        output = dict(result)
+        if force_check == "0":
+            output["location_type"] = ""
+
         # Return properly formatted JSON with quoted keys
         return json.dumps(output, ensure_ascii=False, separators=(',', ':'))
         
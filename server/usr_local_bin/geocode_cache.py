@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Persistent geocoding cache shared by every fetch_latlng_google_v5.py process.
+
+SQLite file keyed by (extension, normalized query) holding the geocode
+result JSON, with a TTL per entry, LRU eviction above max_entries and
+hit/miss counters. A second, short-lived table remembers queries Google
+could not resolve so retries do not pay for them again. Any SQLite problem
+disables the cache for that call instead of failing the lookup.
+
+Usage: python3 geocode_cache.py [stats|clear|purge]
+"""
+import re
+import sys
+import json
+import time
+import sqlite3
+import unicodedata
+
+CACHE_PATH = '/tmp/geocode_cache.sqlite'
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_NEGATIVE_TTL = 10 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    exten TEXT NOT NULL,
+    query TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (exten, query)
+);
+CREATE INDEX IF NOT EXISTS geocode_last_used ON geocode (last_used);
+CREATE TABLE IF NOT EXISTS negative (
+    exten TEXT NOT NULL,
+    query TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (exten, query)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def normalize_query(query):
+    """Case-, accent- and whitespace-insensitive form of an address query"""
+    normalized = unicodedata.normalize('NFD', query or '')
+    normalized = ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
+    normalized = re.sub(r'[^\w]+', ' ', normalized.casefold())
+    return ' '.join(normalized.split())
+
+class GeocodeCache:
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.conn = None
+        try:
+            self.conn = sqlite3.connect(path, timeout=2)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+        except sqlite3.Error:
+            self.conn = None
+
+    @classmethod
+    def for_extension(cls, config, current_exten):
+        """Build a cache using the optional geocodeCache settings of the extension"""
+        settings = {}
+        if config and current_exten in config:
+            settings = config[current_exten].get('geocodeCache') or {}
+        ttl = float(settings.get('ttlHours', DEFAULT_TTL / 3600)) * 3600
+        negative_ttl = float(settings.get('negativeTtlMinutes', DEFAULT_NEGATIVE_TTL / 60)) * 60
+        return cls(ttl=ttl, max_entries=int(settings.get('maxEntries', DEFAULT_MAX_ENTRIES)),
+                   negative_ttl=negative_ttl)
+
+    def _count(self, name):
+        self.conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,))
+        self.conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, exten, query):
+        """Return the cached result dict or None"""
+        if self.conn is None:
+            return None
+        key = normalize_query(query)
+        now = time.time()
+        try:
+            with self.conn:
+                row = self.conn.execute(
+                    "SELECT result, expires FROM geocode WHERE exten = ? AND query = ?",
+                    (str(exten), key)).fetchone()
+                if row is None or row[1] < now:
+                    self._count('misses')
+                    return None
+                self.conn.execute(
+                    "UPDATE geocode SET last_used = ?, hits = hits + 1 WHERE exten = ? AND query = ?",
+                    (now, str(exten), key))
+                self._count('hits')
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def put(self, exten, query, result, ttl=None):
+        if self.conn is None:
+            return
+        key = normalize_query(query)
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO geocode (exten, query, result, created, expires, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (str(exten), key, json.dumps(result, ensure_ascii=False), now, expires, now))
+                self.evict(now)
+        except sqlite3.Error:
+            pass
+
+    def get_negative(self, exten, query):
+        """Return the reason a query recently failed to geocode, or None"""
+        if self.conn is None:
+            return None
+        try:
+            with self.conn:
+                row = self.conn.execute(
+                    "SELECT reason FROM negative WHERE exten = ? AND query = ? AND expires >= ?",
+                    (str(exten), normalize_query(query), time.time())).fetchone()
+                if row is not None:
+                    self._count('negative_hits')
+            return row[0] if row else None
+        except sqlite3.Error:
+            return None
+
+    def put_negative(self, exten, query, reason, ttl=None):
+        if self.conn is None:
+            return
+        expires = time.time() + (self.negative_ttl if ttl is None else ttl)
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO negative (exten, query, reason, expires) VALUES (?, ?, ?, ?)",
+                    (str(exten), normalize_query(query), str(reason), expires))
+        except sqlite3.Error:
+            pass
+
+    def evict(self, now=None):
+        """Drop expired entries and the least recently used ones above max_entries"""
+        now = time.time() if now is None else now
+        self.conn.execute("DELETE FROM geocode WHERE expires < ?", (now,))
+        self.conn.execute("DELETE FROM negative WHERE expires < ?", (now,))
+        self.conn.execute(
+            "DELETE FROM geocode WHERE rowid IN ("
+            "SELECT rowid FROM geocode ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,))
+
+    def stats(self):
+        if self.conn is None:
+            return {}
+        counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        negative = self.conn.execute("SELECT COUNT(*) FROM negative").fetchone()[0]
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hitRate": round(hits / lookups, 3) if lookups else 0.0,
+            "negativeEntries": negative,
+            "negativeHits": counters.get('negative_hits', 0),
+            "prefiltered": counters.get('prefiltered', 0),
+        }
+
+    def count_prefiltered(self):
+        """Count a query rejected before any lookup"""
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self._count('prefiltered')
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        if self.conn is None:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM geocode")
+            self.conn.execute("DELETE FROM negative")
+            self.conn.execute("DELETE FROM counters")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = GeocodeCache()
+    if cache.conn is None:
+        print(f"Cannot open cache at {CACHE_PATH}", file=sys.stderr)
+        sys.exit(1)
+    if command == "clear":
+        cache.clear()
+    elif command == "purge":
+        with cache.conn:
+            cache.evict()
+    elif command != "stats":
+        print("Usage: python geocode_cache.py [stats|clear|purge]", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(cache.stats(), ensure_ascii=False))
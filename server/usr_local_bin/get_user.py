@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
+import os
 import sys
 import json
-import requests
+import simple_http
 import logging
+from caller_cache import CallerCache
 
 # Set up logging for debugging
 logging.basicConfig(
@@ -20,6 +22,87 @@ def load_config(filepath):
         print("{}")  # Return empty JSON object on error
         sys.exit(1)
 
+def request_user_info(extension_config, phone_number, timeout=30):
+    """
+    Call checkCallerID. Returns the profile dict, or None when the API
+    answered with an error. Transport problems raise simple_http.RequestException
+    (or ValueError for a broken JSON body).
+    """
+    accessToken = extension_config.get("clientToken")
+    base_url = extension_config.get("registerBaseUrl")
+
+    # Construct API URL
+    url = base_url.rstrip("/") + f"/api/Calls/checkCallerID/{phone_number}"
+    headers = {
+        "Authorization": accessToken,
+        "Content-Type": "application/json; charset=UTF-8",
+    }
+
+    response = simple_http.get(url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+
+    # Check if the request was successful
+    if data.get("result", {}).get("result") != "SUCCESS":
+        logging.error(f"API returned error: {data.get('result', {}).get('msg')}")
+        return None
+
+    response_data = data.get("response", {})
+    output = {}
+
+    # Always include name if available
+    if response_data.get("callerName"):
+        output["name"] = response_data["callerName"]
+	
+    if response_data.get("doNotServe"):
+        output["doNotServe"] = "1" if response_data["doNotServe"] else "0"
+
+    # Include address if available
+    main_address = response_data.get("mainAddresss")
+    if main_address:
+        if main_address.get("address"):
+            output["pickup"] = main_address["address"]
+        
+        if main_address.get("comments"):
+            output["comments"] = main_address["comments"]
+        else :
+            output["comments"] = ""
+
+        if main_address.get("lat") is not None and main_address.get("lng") is not None:
+            output["latLng"] = {
+                    "lat": main_address["lat"],
+                    "lng": main_address["lng"]
+                }
+
+    return output
+
+def refresh_in_background(current_exten, extension_config, phone_number):
+    """
+    Refetch a profile with the full timeout in a detached child after the
+    short lookup failed, so the caller gets the cached one right away. The child lets go of stdout, otherwise Asterisk's SHELL()
+    would keep waiting for it.
+    """
+    try:
+        if os.fork() > 0:
+            return
+    except OSError as e:
+        logging.error(f"Background refresh not started: {e}")
+        return
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        profile = request_user_info(extension_config, phone_number)
+        cache = CallerCache.for_extension({current_exten: extension_config}, current_exten)
+        if profile is not None:
+            cache.put(current_exten, phone_number, profile)
+            cache.count('refreshes')
+    except Exception as e:
+        logging.error(f"Background refresh failed: {e}")
+    finally:
+        os._exit(0)
+
 def get_user_info(current_exten, phone_number):
     # Load configuration
     config = load_config('/usr/local/bin/config.json')
@@ -39,57 +122,30 @@ def get_user_info(current_exten, phone_number):
         print("{}")
         sys.exit(1)
 
-    # Construct API URL
-    url = base_url.rstrip("/") + f"/api/Calls/checkCallerID/{phone_number}"
-    headers = {
-        "Authorization": accessToken,
-        "Content-Type": "application/json; charset=UTF-8",
-    }
+    # doNotServe can change at any time, so the API is asked even for a cached
+    # caller; the cached profile only stands in when it does not answer in time
+    cache = CallerCache.for_extension(config, current_exten)
+    cached = cache.get(current_exten, phone_number)
+    cache.count('misses' if cached is None else 'hits')
 
-    try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+    # With an old profile to fall back on, do not keep the caller waiting long
+    timeout = cache.fallback_timeout if cached is not None else 30
 
-        # Check if the request was successful
-        if data.get("result", {}).get("result") != "SUCCESS":
-            logging.error(f"API returned error: {data.get('result', {}).get('msg')}")
+    try:
+        profile = request_user_info(extension_config, phone_number, timeout)
+        if profile is None:
             return {}
+        cache.put(current_exten, phone_number, profile)
+        return profile
 
-        response_data = data.get("response", {})
-        output = {}
-
-        # Always include name if available
-        if response_data.get("callerName"):
-            output["name"] = response_data["callerName"]
-	
-        if response_data.get("doNotServe"):
-            output["doNotServe"] = "1" if response_data["doNotServe"] else "0"
-
-        # Include address if available
-        main_address = response_data.get("mainAddresss")
-        if main_address:
-            if main_address.get("address"):
-                output["pickup"] = main_address["address"]
-            
-            if main_address.get("comments"):
-                output["comments"] = main_address["comments"]
-            else :
-                output["comments"] = ""
-
-            if main_address.get("lat") is not None and main_address.get("lng") is not None:
-                output["latLng"] = {
-                        "lat": main_address["lat"],
-                        "lng": main_address["lng"]
-                    }
-
-        return output
-
-    except requests.RequestException as e:
+    except (simple_http.RequestException, ValueError) as e:
         logging.error(f"API request error: {e}")
-        return {}
-    except json.JSONDecodeError:
-        logging.error("Invalid JSON response from API")
+        if cached is not None:
+            cache.count('fallbacks')
+            logging.info(f"Using cached profile for {phone_number} ({int(cached[1])}s old)")
+            if cache.claim_refresh(current_exten, phone_number):
+                refresh_in_background(current_exten, extension_config, phone_number)
+            return cached[0]
         return {}
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
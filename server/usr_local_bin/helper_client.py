@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tiny client for helper_daemon.py.
+
+Used by save_json.py, json_extractor.py, validate.py, extract_json_value.py
+and check_config.py: they try the resident daemon first and fall back to
+running in-process when it is not up. Only imports os/socket/json so it
+stays cheap to load.
+
+The socket lives in a directory of the daemon user (asterisk, mode 0750).
+A directory owned by anyone else, or writable by others, is not trusted:
+the operation then runs in-process rather than take results from a socket
+someone else could have put there.
+
+Can also be called directly from the dialplan:
+    python3 helper_client.py <op> [args...]
+"""
+import os
+import sys
+import json
+import socket
+
+SOCKET_DIR = "/run/agi-helper"
+SOCKET_PATH = os.path.join(SOCKET_DIR, "helper.sock")
+CONNECT_TIMEOUT = 0.2
+REQUEST_TIMEOUT = 10
+
+def trusted_dir(path):
+    """True when path is a real directory of this user that only it can write to"""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (os.path.isdir(path) and not os.path.islink(path)
+            and st.st_uid == os.geteuid() and not st.st_mode & 0o022)
+
+def call(op, args):
+    """
+    Run op on the daemon. Returns (stdout, stderr, exit_code) or None when the
+    daemon is unreachable or its directory is not trusted, so the caller can
+    run the operation itself.
+    """
+    if not trusted_dir(SOCKET_DIR):
+        return None
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    except (AttributeError, OSError):
+        return None
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(SOCKET_PATH)
+        sock.settimeout(REQUEST_TIMEOUT)
+        request = json.dumps({"op": op, "args": list(args)}, ensure_ascii=False)
+        sock.sendall(request.encode("utf-8") + b"\n")
+
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if chunk.endswith(b"\n"):
+                break
+        response = json.loads(b"".join(chunks).decode("utf-8"))
+        if "error" in response:
+            return None
+        return response.get("stdout", ""), response.get("stderr", ""), int(response.get("code", 0))
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+def emit(result):
+    """Write a (stdout, stderr, exit_code) result like the script would and exit"""
+    stdout, stderr, code = result
+    if stdout:
+        sys.stdout.write(stdout)
+        sys.stdout.flush()
+    if stderr:
+        sys.stderr.write(stderr)
+    sys.exit(code)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python helper_client.py <op> [args...]", file=sys.stderr)
+        sys.exit(1)
+
+    result = call(sys.argv[1], sys.argv[2:])
+    if result is None:
+        # Daemon down - run the operation in this process
+        from helper_daemon import run_op
+        result = run_op(sys.argv[1], sys.argv[2:])
+    emit(result)
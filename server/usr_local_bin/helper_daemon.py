@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Resident helper daemon for the small dialplan scripts.
+
+The dialplan runs save_json.py, json_extractor.py, validate.py,
+extract_json_value.py and check_config.py through SHELL()/System() many
+times per call. This daemon keeps the same operations loaded in one process
+and serves them on a unix socket (one JSON request/response line per
+connection). The scripts themselves become thin clients via helper_client.py
+and run in-process when the daemon is down.
+
+Run it as the asterisk user. The socket is /run/agi-helper/helper.sock,
+mode 0660, in a directory that must belong to that user with mode 0750
+(systemd: User=asterisk, RuntimeDirectory=agi-helper,
+RuntimeDirectoryMode=0750). The daemon refuses to start when the
+directory belongs to someone else, since save_json writes wherever it is
+told.
+
+Usage: python3 helper_daemon.py
+"""
+import os
+import sys
+import stat
+import json
+import logging
+import threading
+import traceback
+import signal
+import socketserver
+
+import save_json
+import json_extractor
+import validate
+import extract_json_value
+import check_config
+from helper_client import SOCKET_DIR, SOCKET_PATH
+
+# op name -> run(args) returning (stdout, stderr, exit_code)
+OPS = {
+    "save_json": save_json.run,
+    "json_extractor": json_extractor.run,
+    "validate": validate.run,
+    "extract_json_value": extract_json_value.run,
+    "check_config": check_config.run,
+}
+
+# progress.json is read-modify-write, keep those serialized
+_save_lock = threading.Lock()
+
+def run_op(op, args):
+    """Run a helper operation in this process. Returns (stdout, stderr, exit_code)"""
+    handler = OPS.get(op)
+    if handler is None:
+        return "", f"Unknown operation: {op}\n", 1
+    try:
+        if op == "save_json":
+            with _save_lock:
+                return handler(args)
+        return handler(args)
+    except Exception:
+        return "", traceback.format_exc(), 1
+
+class HelperHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line.decode("utf-8"))
+            op = request["op"]
+            args = [str(arg) for arg in request.get("args", [])]
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"error": f"Bad request: {e}"}
+        else:
+            stdout, stderr, code = run_op(op, args)
+            response = {"stdout": stdout, "stderr": stderr, "code": code}
+            if code != 0:
+                logging.warning(f"{op} {args} exited with {code}: {stderr.strip()}")
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+class HelperServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def prepare_socket_dir(socket_dir):
+    """
+    Create socket_dir (0750) or check that the existing one is a directory of
+    this user. Raises SystemExit when it is not.
+    """
+    try:
+        os.mkdir(socket_dir, 0o750)
+    except FileExistsError:
+        pass
+    st = os.lstat(socket_dir)
+    if not stat.S_ISDIR(st.st_mode):
+        raise SystemExit(f"{socket_dir} is not a directory")
+    if st.st_uid != os.geteuid():
+        raise SystemExit(f"{socket_dir} is owned by uid {st.st_uid}, not by this user ({os.geteuid()})")
+    os.chmod(socket_dir, 0o750)
+
+def main():
+    logging.basicConfig(
+        filename='/tmp/agi_helper.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    socket_path = SOCKET_PATH
+    prepare_socket_dir(SOCKET_DIR)
+
+    # Remove a stale socket left behind by a previous run, the directory is ours
+    try:
+        if stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+
+    # Created 0660 for the asterisk group, never briefly wider
+    old_umask = os.umask(0o117)
+    try:
+        server = HelperServer(socket_path, HelperHandler)
+    finally:
+        os.umask(old_umask)
+    os.chmod(socket_path, 0o660)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logging.info(f"Helper daemon listening on {socket_path}")
+    print(f"Helper daemon listening on {socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+if __name__ == "__main__":
+    main()
@@ -70,61 +70,134 @@ def format_output(value, trim=False):
     
     return result
 
+def parse_batch_spec(spec):
+    """
+    Parse a batch path spec of the form [NAME=]path[:trim]
+    Examples:
+    - "name" -> ("name", "name", False)
+    - "USER_LAT=latLng.lat" -> ("USER_LAT", "latLng.lat", False)
+    - "pickupLocation.address:trim" -> ("pickupLocation.address", "pickupLocation.address", True)
+    """
+    trim = False
+    if spec.endswith(':trim'):
+        spec = spec[:-len(':trim')]
+        trim = True
+    name, sep, path = spec.partition('=')
+    if not sep:
+        path = name
+    return name, path, trim
+
+def extract_many(data, specs):
+    """
+    Extract several dot-notation paths from already parsed JSON data in one go.
+    Missing paths give an empty string. Returns a list of (name, text) tuples.
+    """
+    results = []
+    for spec in specs:
+        name, path, trim = parse_batch_spec(spec)
+        value, error = get_value_by_path(data, path)
+        if error or value is None:
+            text = ""
+        elif isinstance(value, (dict, list)):
+            # Keep nested values on one line
+            text = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        else:
+            text = format_output(value)
+        if trim:
+            text = format_output(text, trim=True)
+        results.append((name, text.replace('\r', ' ').replace('\n', ' ')))
+    return results
+
+def format_batch(results, array=False):
+    """
+    Format extract_many results.
+    array=False: key=value lines (one per path)
+    array=True: quoted comma separated values for Set(ARRAY(VAR1,VAR2,...)=...)
+    """
+    if array:
+        quoted = []
+        for _, text in results:
+            quoted.append('"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"')
+        return ','.join(quoted)
+    return ''.join(f"{name}={text}\n" for name, text in results)
+
+USAGE = """Usage: python json_extractor.py <json_file> <json_path> [trim]
+
+Arguments:
+  json_file  - Path to the JSON file
+  json_path  - Dot-notation path to the desired value
+  trim       - Optional: set to '1' to remove text after the last comma
+
+Examples:
+  python json_extractor.py data.json name
+  python json_extractor.py config.json database.host
+  python json_extractor.py users.json users.0.email
+  python json_extractor.py settings.json app.features.2
+  python json_extractor.py data.json address 1  # with trimming
+  python json_extractor.py --batch data.json name latLng.lat address:trim
+  python json_extractor.py --array data.json name latLng.lat latLng.lng
+
+Path format:
+  - Use dots (.) to separate nested keys
+  - Use numbers for array indices
+  - Example: 'users.0.profile.name' accesses data['users'][0]['profile']['name']
+
+Trim functionality:
+  - When trim=1, removes everything after the last comma in the result
+  - Useful for removing trailing parts of addresses or similar data
+
+Batch mode (one process for many values):
+  - --batch prints key=value lines, --array prints quoted comma separated
+    values for Set(ARRAY(VAR1,VAR2,...)=...)
+  - Each path may be written as [NAME=]path[:trim]
+  - Missing paths give empty values instead of an error"""
+
 def print_usage():
     """Print usage information"""
-    print("Usage: python json_extractor.py <json_file> <json_path> [trim]")
-    print("")
-    print("Arguments:")
-    print("  json_file  - Path to the JSON file")
-    print("  json_path  - Dot-notation path to the desired value")
-    print("  trim       - Optional: set to '1' to remove text after the last comma")
-    print("")
-    print("Examples:")
-    print("  python json_extractor.py data.json name")
-    print("  python json_extractor.py config.json database.host")
-    print("  python json_extractor.py users.json users.0.email")
-    print("  python json_extractor.py settings.json app.features.2")
-    print("  python json_extractor.py data.json address 1  # with trimming")
-    print("")
-    print("Path format:")
-    print("  - Use dots (.) to separate nested keys")
-    print("  - Use numbers for array indices")
-    print("  - Example: 'users.0.profile.name' accesses data['users'][0]['profile']['name']")
-    print("")
-    print("Trim functionality:")
-    print("  - When trim=1, removes everything after the last comma in the result")
-    print("  - Useful for removing trailing parts of addresses or similar data")
+    print(USAGE)
+
+def run(args):
+    """Script entry point without side effects on stdout. Returns (stdout, stderr, exit_code)"""
+    if args and args[0] in ('--batch', '--array'):
+        if len(args) < 3:
+            return USAGE + "\n", "", 1
+        data, error = load_json_file(args[1])
+        if error:
+            return "", f"Error: {error}\n", 1
+        return format_batch(extract_many(data, args[2:]), array=(args[0] == '--array')), "", 0
 
-if __name__ == "__main__":
     # Check command line arguments
-    if len(sys.argv) < 3 or len(sys.argv) > 4:
-        print_usage()
-        sys.exit(1)
-    
-    json_filename = sys.argv[1]
-    json_path = sys.argv[2]
-    
+    if len(args) < 2 or len(args) > 3:
+        return USAGE + "\n", "", 1
+
+    json_filename = args[0]
+    json_path = args[1]
+
     # Check for trim parameter
     trim = False
-    if len(sys.argv) == 4:
-        trim_param = sys.argv[3]
+    if len(args) == 3:
+        trim_param = args[2]
         if trim_param == "1":
             trim = True
         elif trim_param != "0":
-            print("Error: trim parameter must be '0' or '1'", file=sys.stderr)
-            sys.exit(1)
-    
+            return "", "Error: trim parameter must be '0' or '1'\n", 1
+
     # Load JSON file
     data, error = load_json_file(json_filename)
     if error:
-        print(f"Error: {error}", file=sys.stderr)
-        sys.exit(1)
-    
+        return "", f"Error: {error}\n", 1
+
     # Extract value using path
     value, error = get_value_by_path(data, json_path)
     if error:
-        print(f"Error: {error}", file=sys.stderr)
-        sys.exit(1)
-    
+        return "", f"Error: {error}\n", 1
+
     # Output the result with optional trimming
-    print(format_output(value, trim))
\ No newline at end of file
+    return format_output(value, trim) + "\n", "", 0
+
+if __name__ == "__main__":
+    import helper_client
+    result = helper_client.call("json_extractor", sys.argv[1:])
+    if result is None:
+        result = run(sys.argv[1:])
+    helper_client.emit(result)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Location replacement rules applied to address transcripts before geocoding.
+
+Rules live in location_replacements.json, one table per extension plus a
+"*" table shared by all of them (extension rules win on the same name):
+
+    {"*": {"Μπουρνάζι": "Χαλάνδρι"}, "4039": {"Πλατεία Βάθη": "Πλατεία Βάθης"}}
+
+Names are matched case- and accent-insensitively on whole words, longest
+rule first. Rules are indexed by their folded word sequence, so matching is
+one dict lookup per (start word, phrase length) and the cost per query
+depends on the address length, not on how many rules there are. The
+compiled index is kept in a marshal file under /tmp and rebuilt only when
+the JSON file changes.
+
+Usage: python3 location_rules.py <exten> <address...>
+       python3 location_rules.py --compile
+"""
+import sys
+import json
+from text_index import fold_char, split_words, phrase_key, load_compiled
+
+RULES_PATH = '/usr/local/bin/location_replacements.json'
+COMPILED_PATH = '/tmp/location_rules.marshal'
+
+def build_index(rules):
+    """{folded phrase: replacement} plus the longest phrase length in words"""
+    phrases = {}
+    for name, replacement in (rules or {}).items():
+        key = phrase_key(name)
+        if key:
+            phrases[key] = replacement
+    longest = max((key.count(' ') + 1 for key in phrases), default=0)
+    return {'phrases': phrases, 'longest': longest}
+
+def compile_rules(table):
+    """Per-extension indexes from the JSON table, "*" holding the shared rules"""
+    return {str(exten): build_index(rules) for exten, rules in table.items()}
+
+def load_rules(path=RULES_PATH):
+    """Compiled indexes for the rules file, rebuilt only when it changes"""
+    return load_compiled(path, COMPILED_PATH, compile_rules)
+
+def _longest_match(words, start, tables):
+    """(word count, replacement) of the longest rule starting at words[start]"""
+    longest = min(max(table['longest'] for table in tables), len(words) - start)
+    for count in range(longest, 0, -1):
+        key = ' '.join(word for word, _, _ in words[start:start + count])
+        for table in tables:
+            replacement = table['phrases'].get(key)
+            if replacement is not None:
+                return count, replacement
+    return None
+
+def replace_locations(address_query, current_exten, path=RULES_PATH):
+    """
+    Apply the extension's replacement rules to the address.
+    Returns the modified address and whether any rule matched.
+    """
+    indexes = load_rules(path)
+    # Extension rules are looked up before the shared ones
+    tables = [indexes[key] for key in (str(current_exten), '*')
+              if key in indexes and indexes[key]['phrases']]
+    if not tables or not address_query:
+        return address_query, False
+
+    words = split_words(address_query)
+    pieces = []
+    copied = 0
+    index = 0
+    while index < len(words):
+        match = _longest_match(words, index, tables)
+        if match is None:
+            index += 1
+            continue
+        count, replacement = match
+        source_start = words[index][1]
+        source_end = words[index + count - 1][2]
+        # Take trailing combining marks of the last character with it
+        while source_end < len(address_query) and not fold_char(address_query[source_end]):
+            source_end += 1
+        pieces.append(address_query[copied:source_start])
+        pieces.append(replacement)
+        copied = source_end
+        index += count
+
+    if not pieces:
+        return address_query, False
+    pieces.append(address_query[copied:])
+    return ''.join(pieces), True
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "--compile":
+        indexes = load_rules()
+        if not indexes:
+            print(f"No rules loaded from {RULES_PATH}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps({exten: len(index['phrases']) for exten, index in indexes.items()}))
+        sys.exit(0)
+    if len(sys.argv) < 3:
+        print("Usage: python location_rules.py <exten> <address...> | --compile", file=sys.stderr)
+        sys.exit(1)
+    print(replace_locations(" ".join(sys.argv[2:]), sys.argv[1])[0])
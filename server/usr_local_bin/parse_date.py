@@ -4,7 +4,7 @@ import os
 import base64
 import json
 import traceback
-import requests
+import simple_http
 
 def load_config(filepath):
     try:
@@ -25,7 +25,7 @@ def parse_date(api_key, datetext):
             "matchLang" : "en-US"
         }
         
-        response = requests.post(
+        response = simple_http.post(
             "https://www.iqtaxi.com/DateRecognizers/api/Recognize/Date",
             headers=headers,
             data=json.dumps(body),
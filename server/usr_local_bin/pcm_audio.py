@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+16 bit mono PCM helpers for the TTS scripts: WAV in and out with the
+stdlib wave module, gain with clipping protection, resampling,
+concatenation.
+
+Gain and resampling need NumPy; has_gain() tells the caller when it is
+missing so the gain can be requested from the TTS service instead.
+"""
+import io
+import os
+import wave
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def has_gain():
+    return np is not None
+
+def read_wav(wav_bytes):
+    """(pcm, sample_rate) of a 16 bit mono WAV"""
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as source:
+        if source.getnchannels() != 1 or source.getsampwidth() != 2:
+            raise ValueError("expected 16 bit mono audio")
+        return source.readframes(source.getnframes()), source.getframerate()
+
+def wav_bytes(pcm, rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(pcm)
+    return buffer.getvalue()
+
+def write_wav(path, pcm, rate):
+    """Write a WAV atomically, Asterisk never sees a half written prompt"""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(wav_bytes(pcm, rate))
+    os.replace(temp_path, path)
+
+def apply_gain(pcm, gain_db):
+    """Scale 16 bit PCM by gain_db, clipping at full scale instead of wrapping"""
+    if not gain_db:
+        return pcm
+    samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+    samples *= 10 ** (gain_db / 20.0)
+    np.clip(samples, -32768, 32767, out=samples)
+    return samples.astype('<i2').tobytes()
+
+def resample(pcm, rate, target_rate):
+    """Linear interpolation to target_rate, enough for speech going to 8 kHz telephony"""
+    if rate == target_rate:
+        return pcm
+    if np is None:
+        raise ValueError(f"resampling {rate} Hz to {target_rate} Hz needs NumPy")
+    samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+    count = int(len(samples) * target_rate / rate)
+    positions = np.arange(count) * (rate / target_rate)
+    resampled = np.interp(positions, np.arange(len(samples)), samples)
+    return np.round(resampled).astype('<i2').tobytes()
+
+def silence(rate, milliseconds):
+    return b'\x00\x00' * (rate * milliseconds // 1000)
+
+def concat(parts, rate, gap_ms=0):
+    """Join PCM parts with gap_ms of silence between them"""
+    gap = silence(rate, gap_ms)
+    return gap.join(parts)
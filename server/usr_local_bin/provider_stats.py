@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Latency and win counters of the STT/TTS providers raced against each other.
+
+One SQLite file for all scripts. Every answer (or failure) of a provider is
+recorded with its latency in a fixed bucket histogram; the provider whose
+answer was used gets a win. A provider still running when the race is
+decided is recorded at that moment, as cancelled (another one won) or as a
+timeout error, with the time it had run, so slow providers are not dropped
+from the numbers. Any SQLite problem disables the counters for that call.
+
+Usage: python3 provider_stats.py [stats|clear] [stt|tts]
+"""
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+STATS_PATH = '/tmp/provider_stats.sqlite'
+# Upper bounds of the latency buckets in milliseconds, the last one is open
+BUCKETS_MS = (250, 500, 1000, 2000, 3000, 5000, 10000)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS providers (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    empty INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    latency_ms_total REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, name)
+);
+CREATE TABLE IF NOT EXISTS latency (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, name, bucket)
+);
+"""
+
+def bucket_of(latency_ms):
+    for index, bound in enumerate(BUCKETS_MS):
+        if latency_ms <= bound:
+            return index
+    return len(BUCKETS_MS)
+
+def bucket_label(index):
+    if index < len(BUCKETS_MS):
+        return f"<={BUCKETS_MS[index]}ms"
+    return f">{BUCKETS_MS[-1]}ms"
+
+class ProviderStats:
+    def __init__(self, kind, path=STATS_PATH):
+        self.kind = kind
+        self.path = path
+        self.conn = None
+        # Racing providers report from their own threads
+        self.lock = threading.Lock()
+        try:
+            self.conn = sqlite3.connect(path, timeout=2, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(providers)")}
+            if "cancelled" not in columns:
+                self.conn.execute("ALTER TABLE providers ADD COLUMN cancelled INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.Error:
+            self.conn = None
+
+    def record(self, name, latency_ms, outcome):
+        """Count one answer; outcome is ok, empty, error, timeout (counted as an error) or cancelled"""
+        if self.conn is None:
+            return
+        try:
+            with self.lock, self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO providers (kind, name) VALUES (?, ?)", (self.kind, name))
+                self.conn.execute(
+                    "UPDATE providers SET requests = requests + 1, latency_ms_total = latency_ms_total + ?, "
+                    "empty = empty + ?, errors = errors + ?, cancelled = cancelled + ? WHERE kind = ? AND name = ?",
+                    (latency_ms, int(outcome == "empty"), int(outcome in ("error", "timeout")),
+                     int(outcome == "cancelled"), self.kind, name))
+                self.conn.execute("INSERT OR IGNORE INTO latency (kind, name, bucket, count) VALUES (?, ?, ?, 0)",
+                                  (self.kind, name, bucket_of(latency_ms)))
+                self.conn.execute("UPDATE latency SET count = count + 1 WHERE kind = ? AND name = ? AND bucket = ?",
+                                  (self.kind, name, bucket_of(latency_ms)))
+        except sqlite3.Error:
+            pass
+
+    def win(self, name):
+        if self.conn is None:
+            return
+        try:
+            with self.lock, self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO providers (kind, name) VALUES (?, ?)", (self.kind, name))
+                self.conn.execute("UPDATE providers SET wins = wins + 1 WHERE kind = ? AND name = ?", (self.kind, name))
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        if self.conn is None:
+            return {}
+        result = {}
+        rows = self.conn.execute(
+            "SELECT name, requests, wins, empty, errors, cancelled, latency_ms_total FROM providers "
+            "WHERE kind = ? ORDER BY name", (self.kind,)).fetchall()
+        for name, requests, wins, empty, errors, cancelled, total in rows:
+            histogram = self.conn.execute(
+                "SELECT bucket, count FROM latency WHERE kind = ? AND name = ? ORDER BY bucket",
+                (self.kind, name)).fetchall()
+            result[name] = {
+                "requests": requests,
+                "wins": wins,
+                "winRate": round(wins / requests, 3) if requests else 0,
+                "empty": empty,
+                "errors": errors,
+                "cancelled": cancelled,
+                "avgLatencyMs": round(total / requests, 1) if requests else 0,
+                "latency": {bucket_label(bucket): count for bucket, count in histogram}
+            }
+        return result
+
+    def clear(self):
+        if self.conn is None:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM providers WHERE kind = ?", (self.kind,))
+            self.conn.execute("DELETE FROM latency WHERE kind = ?", (self.kind,))
+
+class Race:
+    """
+    The providers of one hedged request. start() when a provider is launched,
+    answer() from its thread when it is done, end() once the race is decided:
+    whoever is still running is recorded then with the time it had run, and
+    its late answer is ignored, the script may exit before it comes.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.lock = threading.Lock()
+        self.running = {}
+        self.ended = False
+
+    def start(self, name):
+        with self.lock:
+            self.running[name] = time.time()
+
+    def answer(self, name, outcome):
+        with self.lock:
+            if self.ended or name not in self.running:
+                return
+            started = self.running.pop(name)
+        self.stats.record(name, (time.time() - started) * 1000.0, outcome)
+
+    def end(self, outcome):
+        """outcome for the providers still running: cancelled after a win, timeout otherwise"""
+        with self.lock:
+            self.ended = True
+            running, self.running = self.running, {}
+        now = time.time()
+        for name, started in running.items():
+            self.stats.record(name, (now - started) * 1000.0, outcome)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    kinds = sys.argv[2:] or ["stt", "tts"]
+    if command not in ("stats", "clear"):
+        print("Usage: python provider_stats.py [stats|clear] [stt|tts]", file=sys.stderr)
+        sys.exit(1)
+    output = {}
+    for kind in kinds:
+        stats = ProviderStats(kind)
+        if stats.conn is None:
+            print(f"Cannot open stats at {STATS_PATH}", file=sys.stderr)
+            sys.exit(1)
+        if command == "clear":
+            stats.clear()
+        output[kind] = stats.stats()
+    print(json.dumps(output, ensure_ascii=False, indent=2))
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 import sys
 import json
-import requests
+import simple_http
 import os
 import logging
+from caller_cache import CallerCache
 
 # Ρύθμιση καταγραφής σε αρχείο για αποσφαλμάτωση
 logging.basicConfig(
@@ -170,7 +171,7 @@ def register_call(current_exten, json_file_path, external_reference_id):
     logging.debug(f"Φορτίο API: {json.dumps(payload, ensure_ascii=False)}")
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = simple_http.post(url, headers=headers, json=payload, timeout=30)
         response.raise_for_status()
         api_response = response.json()
         logging.debug(f"Απάντηση API: {json.dumps(api_response, ensure_ascii=False)}")
@@ -187,9 +188,15 @@ def register_call(current_exten, json_file_path, external_reference_id):
         if not msg:
             msg = "Κάτι πήγε στραβά με την καταχώρηση της διαδρομής σας"
         
+        # Ο cached πελάτης (get_user.py) δεν ισχύει πια αν άλλαξε η κύρια διεύθυνση
+        if not call_operator:
+            cache = CallerCache.for_extension(config, current_exten)
+            if cache.invalidate_if_address_changed(current_exten, caller_phone, road_name, pickup_lat, pickup_lng):
+                logging.info(f"Ακύρωση cached προφίλ για {caller_phone}")
+        
         print_result_json(call_operator, msg)
         
-    except requests.RequestException as e:
+    except simple_http.RequestException as e:
         logging.error(f"Σφάλμα αιτήματος API: {e}")
         print_result_json(True, "Κάτι πήγε στραβά με την καταχώρηση της διαδρομής σας")
     except json.JSONDecodeError:
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Batch renderer for the company sound libraries (agi/var_sounds/<company>/).
+
+Each company directory holds a prompts.json manifest:
+
+    {
+        "languages": ["el", "en", "bg"],
+        "gain": 0,
+        "voices": {"el": "el-GR-Wavenet-A"},
+        "prompts": {
+            "welcome": {"el": "Καλώς ήρθατε ...", "en": "Welcome ...", "bg": "..."},
+            ...
+        }
+    }
+
+Every prompt x language becomes <prompt>_<lang>.wav (8 kHz, mono, 16 bit),
+rendered through send_to_google_tts.py on a bounded thread pool. The hash
+of what produced each file is kept in .prompts_state.json next to it, so
+unchanged prompts are skipped and re-voicing only renders what changed.
+Files are replaced atomically, a failed render keeps the old file.
+
+--adopt records the existing files as current without rendering, for
+libraries that were produced by hand before the manifest existed.
+
+Usage: python3 render_prompts.py <var_sounds_or_company_dir> [...] [--jobs N] [--force] [--adopt] [--dry-run] [--api-key KEY]
+The API key can also be given as GOOGLE_TTS_API_KEY.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from send_to_google_tts import request_audio, save_audio_files
+from tts_cache import RENDER_VERSION
+
+MANIFEST_NAME = 'prompts.json'
+STATE_NAME = '.prompts_state.json'
+LANGUAGE_CODES = {"el": "el-GR", "en": "en-US", "bg": "bg-BG"}
+DEFAULT_JOBS = 8
+
+def load_manifest(company_dir):
+    with open(os.path.join(company_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_state(company_dir):
+    try:
+        with open(os.path.join(company_dir, STATE_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(company_dir, state):
+    path = os.path.join(company_dir, STATE_NAME)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(temp_path, path)
+
+def prompt_hash(text, language_code, voice_name, gain):
+    parts = [RENDER_VERSION, text, language_code, voice_name or "", float(gain)]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def plan(company_dir, manifest):
+    """One job per prompt x language: {"file", "base_path", "text", "language_code", "voice", "gain", "hash"}"""
+    languages = manifest.get('languages') or list(LANGUAGE_CODES)
+    codes = dict(LANGUAGE_CODES, **(manifest.get('languageCodes') or {}))
+    voices = manifest.get('voices') or {}
+    gain = manifest.get('gain', 0)
+    jobs = []
+    for name, texts in sorted((manifest.get('prompts') or {}).items()):
+        for lang in languages:
+            text = (texts.get(lang) or "").strip()
+            if not text:
+                continue
+            language_code = codes.get(lang, lang)
+            jobs.append({
+                "file": f"{name}_{lang}.wav",
+                "base_path": os.path.join(company_dir, f"{name}_{lang}"),
+                "text": text,
+                "language_code": language_code,
+                "voice": voices.get(lang),
+                "gain": gain,
+                "hash": prompt_hash(text, language_code, voices.get(lang), gain),
+            })
+    return jobs
+
+def render_job(api_key, job):
+    audio = request_audio(api_key, job["text"], job["language_code"], "wav", job["gain"], job["voice"])
+    if audio is None:
+        raise RuntimeError("TTS request failed")
+    if not save_audio_files(audio, job["base_path"], "wav", job["gain"]):
+        raise RuntimeError("saving the WAV failed")
+
+def render_company(company_dir, api_key, pool, force=False, adopt=False, dry_run=False):
+    """Render the outdated prompts of one company. Returns a summary dict"""
+    manifest = load_manifest(company_dir)
+    state = load_state(company_dir)
+    jobs = plan(company_dir, manifest)
+    outdated = [job for job in jobs
+                if force or state.get(job["file"]) != job["hash"]
+                or not os.path.exists(f"{job['base_path']}.wav")]
+    summary = {"company": os.path.basename(os.path.normpath(company_dir)),
+               "prompts": len(jobs), "rendered": [], "failed": {}, "skipped": len(jobs) - len(outdated)}
+
+    if adopt:
+        summary["adopted"] = []
+        for job in outdated:
+            if os.path.exists(f"{job['base_path']}.wav"):
+                state[job["file"]] = job["hash"]
+                summary["adopted"].append(job["file"])
+        if not dry_run:
+            save_state(company_dir, state)
+        return summary
+    if dry_run:
+        summary["outdated"] = [job["file"] for job in outdated]
+        return summary
+
+    futures = {pool.submit(render_job, api_key, job): job for job in outdated}
+    for future, job in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            summary["failed"][job["file"]] = str(e)
+            continue
+        state[job["file"]] = job["hash"]
+        summary["rendered"].append(job["file"])
+    save_state(company_dir, state)
+    return summary
+
+def company_dirs(paths):
+    """Company directories with a manifest, a var_sounds root expands to its companies"""
+    result = []
+    for path in paths:
+        if os.path.exists(os.path.join(path, MANIFEST_NAME)):
+            result.append(path)
+            continue
+        for entry in sorted(os.listdir(path)):
+            if os.path.exists(os.path.join(path, entry, MANIFEST_NAME)):
+                result.append(os.path.join(path, entry))
+    return result
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Render the var_sounds prompt libraries from their manifests")
+    parser.add_argument('paths', nargs='+', help="var_sounds directory or company directories")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help="parallel TTS requests")
+    parser.add_argument('--force', action='store_true', help="render every prompt, changed or not")
+    parser.add_argument('--adopt', action='store_true', help="record existing files as current without rendering")
+    parser.add_argument('--dry-run', action='store_true', help="only list what would be rendered")
+    parser.add_argument('--api-key', default=os.environ.get('GOOGLE_TTS_API_KEY'))
+    args = parser.parse_args(argv)
+
+    companies = company_dirs(args.paths)
+    if not companies:
+        print(f"No {MANIFEST_NAME} found", file=sys.stderr)
+        return 1
+    if not (args.api_key or args.adopt or args.dry_run):
+        print("Google TTS API key missing (--api-key or GOOGLE_TTS_API_KEY)", file=sys.stderr)
+        return 1
+
+    started = time.time()
+    summaries = []
+    # One pool for all companies, the limit is on concurrent requests to Google
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for company_dir in companies:
+            try:
+                summaries.append(render_company(company_dir, args.api_key, pool, args.force, args.adopt, args.dry_run))
+            except (OSError, ValueError) as e:
+                traceback.print_exc()
+                summaries.append({"company": os.path.basename(os.path.normpath(company_dir)), "error": str(e)})
+    print(json.dumps({"companies": summaries, "seconds": round(time.time() - started, 2)},
+                     ensure_ascii=False, indent=2))
+    failed = any(s.get("failed") or s.get("error") for s in summaries)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -3,25 +3,18 @@ import sys
 import json
 import os
 
-def main():
-    if len(sys.argv) != 4:
-        print("Usage: save_json.py <key> <value> <json_path>", file=sys.stderr)
-        sys.exit(1)
-    
-    key = sys.argv[1]
-    value = sys.argv[2]
-    path = sys.argv[3]
-    
+def save_json(key, value, path):
+    """Merge key/value into the JSON file at path. Returns an error message or None"""
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    
+
     # Load existing JSON or create empty dict
     try:
         with open(path, 'r', encoding='utf-8') as f:
             data = json.load(f)
     except:
         data = {}
-    
+
     # Try to parse value as JSON, if it fails save as string
     try:
         # Try to parse as JSON
@@ -30,14 +23,31 @@ def main():
     except:
         # If parsing fails, save as string
         data[key] = value
-    
+
     # Save back to file
     try:
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
     except Exception as e:
-        print(f"Error saving JSON: {e}", file=sys.stderr)
-        sys.exit(1)
+        return str(e)
+    return None
+
+def run(args):
+    """Script entry point without side effects on stdout. Returns (stdout, stderr, exit_code)"""
+    if len(args) != 3:
+        return "", "Usage: save_json.py <key> <value> <json_path>\n", 1
+
+    error = save_json(args[0], args[1], args[2])
+    if error:
+        return "", f"Error saving JSON: {error}\n", 1
+    return "", "", 0
+
+def main():
+    import helper_client
+    result = helper_client.call("save_json", sys.argv[1:])
+    if result is None:
+        result = run(sys.argv[1:])
+    helper_client.emit(result)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
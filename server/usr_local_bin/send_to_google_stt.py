@@ -3,8 +3,17 @@ import sys
 import os
 import base64
 import json
+import logging
 import traceback
-import requests
+import simple_http
+from audio_trim import load_for_stt
+from audio_encode import encode_for_stt
+
+logging.basicConfig(
+    filename='/tmp/send_to_google_stt.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
 
 def load_config(filepath):
     try:
@@ -14,43 +23,60 @@ def load_config(filepath):
         print(f"Error loading config file: {e}", file=sys.stderr)
         return None
 
-def send_to_google_stt(api_key, wav_file):
+def recognize_google(api_key, wav_file, extension_config=None, timeout=30):
+    """
+    Transcript of wav_file from Google STT ("" when nothing was recognized).
+    Failures raise simple_http.RequestException.
+    """
+    # Leading/trailing silence is cut before upload (sttTrim in config.json)
+    audio_bytes, trim_stats = load_for_stt(wav_file, extension_config)
+    if trim_stats:
+        logging.info(f"Trimmed {wav_file}: {trim_stats['originalMs']}ms -> {trim_stats['trimmedMs']}ms, "
+                     f"{trim_stats['originalBytes']} -> {trim_stats['trimmedBytes']} bytes")
+    # FLAC (or OGG_OPUS) unless sttEncoding says otherwise
+    audio_bytes, audio_config = encode_for_stt(audio_bytes, extension_config)
+    logging.info(f"Uploading {len(audio_bytes)} bytes as {audio_config['encoding']}")
+    audio_content = base64.b64encode(audio_bytes).decode("utf-8")
+    
+    headers = {"Content-Type": "application/json"}
+    recognition_config = dict(audio_config)
+    recognition_config.update({
+        "languageCode": "el-GR",
+        "profanityFilter": True
+    })
+    body = {
+        "config": recognition_config,
+        "audio": {"content": audio_content}
+    }
+    
+    response = simple_http.post(
+        f"https://speech.googleapis.com/v1/speech:recognize?key={api_key}",
+        headers=headers,
+        data=json.dumps(body),
+        timeout=timeout
+    )
+    
+    if response.status_code != 200:
+        raise simple_http.HTTPError(f"{response.status_code} - {response.text}", response=response)
+    result = response.json()
+    if not result.get("results"):
+        return ""
+    return " ".join(
+        alt["transcript"]
+        for res in result["results"]
+        for alt in res["alternatives"]
+    )
+
+def send_to_google_stt(api_key, wav_file, extension_config=None):
     try:
         if not os.path.exists(wav_file):
             return f"Error: WAV file {wav_file} does not exist"
-            
-        with open(wav_file, "rb") as f:
-            audio_content = base64.b64encode(f.read()).decode("utf-8")
-        
-        headers = {"Content-Type": "application/json"}
-        body = {
-            "config": {
-                "encoding": "LINEAR16",
-                "sampleRateHertz": 16000,
-                "languageCode": "el-GR",
-                "profanityFilter": True 
-            },
-            "audio": {"content": audio_content}
-        }
-        
-        response = requests.post(
-            f"https://speech.googleapis.com/v1/speech:recognize?key={api_key}",
-            headers=headers,
-            data=json.dumps(body),
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if not result.get("results"):
-                return ""
-            return " ".join(
-                alt["transcript"]
-                for res in result["results"]
-                for alt in res["alternatives"]
-            )
-        else:
-            return f"Error: {response.status_code} - {response.text}"
+
+        # With sttHedge the self-hosted recognizer is raced against Google
+        if (extension_config or {}).get('sttHedge'):
+            import stt_hedge
+            return stt_hedge.recognize(extension_config, wav_file)
+        return recognize_google(api_key, wav_file, extension_config)
             
     except Exception as e:
         traceback.print_exc()
@@ -74,5 +100,5 @@ if __name__ == "__main__":
         sys.exit(1)
     
     api_key = config[current_exten]['googleApiKey']
-    result = send_to_google_stt(api_key, wav_file)
+    result = send_to_google_stt(api_key, wav_file, config[current_exten])
     print(result, flush=True)
\ No newline at end of file
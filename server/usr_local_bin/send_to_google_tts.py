@@ -4,8 +4,9 @@ import os
 import base64
 import json
 import traceback
-import requests
-import subprocess
+import simple_http
+from tts_cache import TTSCache, cache_key
+from pcm_audio import read_wav, write_wav, apply_gain, has_gain
 
 def load_config(filepath):
     try:
@@ -15,7 +16,13 @@ def load_config(filepath):
         print(f"Error loading config file: {e}", file=sys.stderr)
         return None
 
-def call_google_tts_api(api_key, text, language_code="el-GR", voice_name=None):
+# Sample rate of the prompts Asterisk plays
+WAV_RATE = 8000
+# Largest volumeGainDb Google accepts
+MAX_GOOGLE_GAIN_DB = 16.0
+
+def call_google_tts_api(api_key, text, language_code="el-GR", voice_name=None,
+                        audio_encoding="MP3", sample_rate=None, volume_gain_db=0.0, timeout=30):
     """Call Google Cloud Text-to-Speech API to generate speech"""
     try:
         url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={api_key}"
@@ -25,18 +32,21 @@ def call_google_tts_api(api_key, text, language_code="el-GR", voice_name=None):
         if voice_name:
             voice_config["name"] = voice_name
             
+        audio_config = {
+            "audioEncoding": audio_encoding,
+            "speakingRate": 1.0,
+            "pitch": 0.0,
+            "volumeGainDb": volume_gain_db
+        }
+        if sample_rate:
+            audio_config["sampleRateHertz"] = sample_rate
         data = {
             "input": {"text": text},
             "voice": voice_config,
-            "audioConfig": {
-                "audioEncoding": "MP3",
-                "speakingRate": 1.0,
-                "pitch": 0.0,
-                "volumeGainDb": 0.0
-            }
+            "audioConfig": audio_config
         }
         
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        response = simple_http.post(url, headers=headers, json=data, timeout=timeout)
         
         if response.status_code == 200:
             response_data = response.json()
@@ -49,63 +59,51 @@ def call_google_tts_api(api_key, text, language_code="el-GR", voice_name=None):
         traceback.print_exc()
         return None
 
-def save_audio_files(audio_data, base_path, output_format="both", gain=10):
-    """Save MP3 and/or WAV files based on output_format"""
+def request_audio(api_key, text, language_code="el-GR", output_format="wav", gain=10, voice_name=None, timeout=30):
+    """
+    Ask Google for what output_format needs: LINEAR16 at 8 kHz for the WAV
+    (no transcode needed) and MP3 only when it was asked for. Returns
+    {"wav": .., "mp3": ..} or None.
+
+    "both" costs two billed requests: without ffmpeg there is no MP3 encoder
+    to derive the MP3 from the LINEAR16 answer, so Google renders each one.
+    """
+    audio = {}
+    if output_format in ["mp3", "both"]:
+        audio["mp3"] = call_google_tts_api(api_key, text, language_code, voice_name, timeout=timeout)
+        if audio["mp3"] is None:
+            return None
+    if output_format in ["wav", "both"]:
+        # Without NumPy the gain is applied by Google, as far as it allows
+        google_gain = 0.0 if has_gain() else max(-96.0, min(MAX_GOOGLE_GAIN_DB, float(gain)))
+        audio["wav"] = call_google_tts_api(api_key, text, language_code, voice_name,
+                                           "LINEAR16", WAV_RATE, google_gain, timeout)
+        if audio["wav"] is None:
+            return None
+    return audio
+
+def save_audio_files(audio, base_path, output_format="wav", gain=10):
+    """Save MP3 and/or WAV files based on output_format, audio as returned by request_audio"""
     try:
         saved_files = []
         
         if output_format in ["mp3", "both"]:
             # Save MP3 file
             mp3_path = f"{base_path}.mp3"
-            with open(mp3_path, 'wb') as f:
-                f.write(audio_data)
+            temp_path = f"{mp3_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(audio["mp3"])
+            os.replace(temp_path, mp3_path)
             saved_files.append(mp3_path)
         
         if output_format in ["wav", "both"]:
-            # Convert to WAV using ffmpeg
+            # LINEAR16 comes back as a WAV, gain is applied to the samples
             wav_path = f"{base_path}.wav"
-            
-            # For WAV, we need the MP3 as input to ffmpeg
-            if output_format == "wav":
-                # Create temporary MP3 file if we're only saving WAV
-                temp_mp3_path = f"{base_path}_temp.mp3"
-                with open(temp_mp3_path, 'wb') as f:
-                    f.write(audio_data)
-                input_file = temp_mp3_path
-            else:
-                # Use the MP3 we already saved
-                input_file = f"{base_path}.mp3"
-            
-            # Build ffmpeg command
-            # Apply gain (convert dB to linear scale for ffmpeg volume filter)
-            if gain != 0:
-                # Convert dB to linear scale: linear = 10^(dB/20)
-                linear_gain = 10 ** (gain / 20.0)
-                volume_filter = f"volume={linear_gain}"
-            else:
-                volume_filter = "volume=1.0"
-            
-            cmd = [
-                'ffmpeg', '-y',  # -y to overwrite output files
-                '-i', input_file,  # input file
-                '-ac', '1',      # mono audio
-                '-ar', '8000',   # 8kHz sample rate
-                '-af', volume_filter,  # apply volume gain
-                wav_path         # output file
-            ]
-            
-            # Run ffmpeg conversion
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"ffmpeg error: {result.stderr}", file=sys.stderr)
-                return False
-            
+            pcm, rate = read_wav(audio["wav"])
+            if has_gain():
+                pcm = apply_gain(pcm, float(gain))
+            write_wav(wav_path, pcm, rate)
             saved_files.append(wav_path)
-            
-            # Clean up temporary MP3 file if we only wanted WAV
-            if output_format == "wav" and os.path.exists(temp_mp3_path):
-                os.remove(temp_mp3_path)
         
         return saved_files
         
@@ -113,10 +111,51 @@ def save_audio_files(audio_data, base_path, output_format="both", gain=10):
         traceback.print_exc()
         return False
 
+def synthesize_to_files(api_key, text, base_path, language_code="el-GR", gain=10, output_format="wav",
+                        cache=None, voice_name=None, extension_config=None):
+    """
+    Render text to base_path.mp3/.wav through the cache. Returns the saved
+    paths, None when synthesis failed or False when saving failed. When
+    extension_config has ttsProviders the audio comes from the hedged
+    providers of tts_providers.py instead of Google alone; for "both" the
+    WAV is raced once and the winner renders the MP3 too (same voice, one
+    request more, every provider returns MP3).
+    """
+    use_providers = bool(extension_config and extension_config.get('ttsProviders'))
+    formats = ["mp3", "wav"] if output_format == "both" else [output_format]
+    voice_key = voice_name or ("providers" if use_providers else None)
+    keys = {fmt: cache_key(text, language_code, voice_key, gain, fmt) for fmt in formats}
+    if cache is not None:
+        hits = [f"{base_path}.{fmt}" for fmt in formats if cache.get(keys[fmt], fmt, f"{base_path}.{fmt}")]
+        if len(hits) == len(formats):
+            return hits
+
+    if use_providers:
+        import tts_providers
+        try:
+            raced = "wav" if "wav" in formats else formats[0]
+            audio = {}
+            audio[raced], provider = tts_providers.synthesize(extension_config, text, raced, language_code, gain)
+            for fmt in formats:
+                if fmt not in audio:
+                    audio[fmt] = tts_providers.render_with(extension_config, provider, text, fmt, language_code, gain)
+        except simple_http.RequestException as e:
+            print(f"TTS providers failed: {e}", file=sys.stderr)
+            return None
+    else:
+        audio = request_audio(api_key, text, language_code, output_format, gain, voice_name)
+    if audio is None:
+        return None
+    saved_files = save_audio_files(audio, base_path, output_format, gain)
+    if saved_files and cache is not None:
+        for fmt in formats:
+            cache.put(keys[fmt], fmt, f"{base_path}.{fmt}")
+    return saved_files
+
 if __name__ == "__main__":
     if len(sys.argv) < 4:
         print("Usage: python send_to_google_tts.py <current_exten> <text> <output_base_path> [lang] [gain] [format]", file=sys.stderr)
-        print("format: mp3, wav, or both (default: both)", file=sys.stderr)
+        print("format: mp3, wav, or both (default: wav; both is two TTS requests)", file=sys.stderr)
         print("Example: python send_to_google_tts.py 101 'Hello world' '/tmp/audio' el-GR 10 wav", file=sys.stderr)
         sys.exit(1)
     
@@ -125,7 +164,7 @@ if __name__ == "__main__":
     output_base_path = sys.argv[3]
     language_code = sys.argv[4] if len(sys.argv) > 4 else "el-GR"
     gain = float(sys.argv[5]) if len(sys.argv) > 5 else 10
-    output_format = sys.argv[6] if len(sys.argv) > 6 else "both"
+    output_format = sys.argv[6] if len(sys.argv) > 6 else "wav"
     
     # Validate output format
     if output_format not in ["mp3", "wav", "both"]:
@@ -145,18 +184,18 @@ if __name__ == "__main__":
             api_key = config[current_exten][key_name]
             break
     
-    if not api_key:
+    if not api_key and not config[current_exten].get('ttsProviders'):
         print("TTS API key not found for extension", file=sys.stderr)
         sys.exit(1)
     
-    # Generate audio
-    audio_data = call_google_tts_api(api_key, text, language_code)
-    if audio_data is None:
-        print("Error: Failed to generate speech from Google TTS API", file=sys.stderr)
+    # Generate audio, repeated prompts come from the cache (ttsCache in config.json)
+    cache = TTSCache.for_extension(config, current_exten)
+    saved_files = synthesize_to_files(api_key, text, output_base_path, language_code, gain, output_format, cache,
+                                      extension_config=config[current_exten])
+    if saved_files is None:
+        print("Error: Failed to generate speech", file=sys.stderr)
         sys.exit(1)
     
-    # Save audio files
-    saved_files = save_audio_files(audio_data, output_base_path, output_format, gain)
     if saved_files:
         print(f"Audio files saved: {', '.join(saved_files)}", flush=True)
     else:
@@ -1,28 +1,48 @@
 #!/usr/bin/env python3
 
 import sys
-import requests
 import json
 import os
+import uuid
 import traceback
+import simple_http
+
+SERVER_URL = "http://188.245.212.246:2700/stt"
+
+def multipart_body(field, filename, content, content_type):
+    """multipart/form-data body with a single file field, returns (body, content_type)"""
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode('utf-8')
+    tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return head + content + tail, f'multipart/form-data; boundary={boundary}'
+
+def recognize_self_hosted(wav_file, server_url=SERVER_URL, timeout=30, audio_bytes=None):
+    """
+    Transcript from the self-hosted recognizer, None when the answer has no
+    text at all. Failures raise simple_http.RequestException or ValueError.
+    """
+    if audio_bytes is None:
+        with open(wav_file, 'rb') as f:
+            audio_bytes = f.read()
+    body, content_type = multipart_body('file', os.path.basename(wav_file), audio_bytes, 'audio/wav')
+    response = simple_http.post(server_url, headers={'Content-Type': content_type}, data=body, timeout=timeout)
+    if response.status_code != 200:
+        raise simple_http.HTTPError(f"Server returned {response.status_code} - {response.text}", response=response)
+    return response.json().get("text")
 
 def send_to_stt(wav_file):
-    server_url = "http://188.245.212.246:2700/stt"
     try:
         if not os.path.exists(wav_file):
             return f"Error: WAV file {wav_file} does not exist"
 
-        with open(wav_file, 'rb') as f:
-            files = {'file': (os.path.basename(wav_file), f, 'audio/wav')}
-            response = requests.post(server_url, files=files, timeout=30)
-
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("text", "No speech detected.")
-        else:
-            return f"Error: Server returned {response.status_code} - {response.text}"
+        text = recognize_self_hosted(wav_file)
+        return "No speech detected." if text is None else text
 
-    except requests.RequestException as e:
+    except simple_http.HTTPError as e:
+        return f"Error: {str(e)}"
+    except simple_http.RequestException as e:
         traceback.print_exc()
         return f"Error: Network issue - {str(e)}"
     except json.JSONDecodeError as e:
@@ -40,4 +60,3 @@ if __name__ == "__main__":
     wav_file = sys.argv[1]
     result = send_to_stt(wav_file)
     print(result, flush=True)
-
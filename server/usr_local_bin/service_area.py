@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Service area of each extension, derived offline from past pickups.
+
+"compute" walks the stored calls (/tmp/auto_register_call/<exten>/<caller>/
+<uniqueid>/progress.json), takes the pickupLocation coordinates, trims the
+outer percentiles, adds a margin and writes per-extension bounds and
+centroid to service_areas.json:
+
+    {"4036": {"bounds": {"south": .., "west": .., "north": .., "east": ..},
+              "centroid": {"lat": .., "lng": ..}, "samples": 1200,
+              "components": "country:GR", "updated": "2025-01-01 04:00:00"}}
+
+fetch_latlng_google_v5.py sends the bounds (and components) to Google as a
+region bias and rejects pickups that still resolve outside the area.
+
+Usage: python3 service_area.py compute [--base DIR] [--out FILE] [--margin-km KM]
+                                       [--trim PERCENT] [--min-samples N] [--days N]
+                                       [--country CC]
+       python3 service_area.py show [exten]
+"""
+import os
+import sys
+import json
+import math
+import time
+
+CALLS_DIR = '/tmp/auto_register_call'
+SERVICE_AREAS_PATH = '/usr/local/bin/service_areas.json'
+
+KM_PER_DEGREE = 111.32
+
+def load_service_areas(path=SERVICE_AREAS_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_service_area(current_exten, path=SERVICE_AREAS_PATH):
+    """Service area of the extension or None"""
+    return load_service_areas(path).get(str(current_exten))
+
+def bounds_param(area):
+    """Google "bounds" parameter (south,west|north,east) for an area"""
+    b = area['bounds']
+    return f"{b['south']},{b['west']}|{b['north']},{b['east']}"
+
+def in_service_area(area, lat, lng):
+    b = area['bounds']
+    return b['south'] <= lat <= b['north'] and b['west'] <= lng <= b['east']
+
+def iter_pickups(base_dir, max_age_days=None):
+    """(exten, lat, lng) for every stored call with pickup coordinates"""
+    oldest = time.time() - max_age_days * 86400 if max_age_days else None
+    for exten in sorted(os.listdir(base_dir)):
+        exten_dir = os.path.join(base_dir, exten)
+        if not os.path.isdir(exten_dir):
+            continue
+        for root, dirs, files in os.walk(exten_dir):
+            if 'progress.json' not in files:
+                continue
+            path = os.path.join(root, 'progress.json')
+            try:
+                if oldest and os.path.getmtime(path) < oldest:
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                lat_lng = data['pickupLocation']['latLng']
+                lat, lng = float(lat_lng['lat']), float(lat_lng['lng'])
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            # "κέντρο" style answers and failed lookups are stored as 0,0
+            if lat == 0 and lng == 0:
+                continue
+            yield exten, lat, lng
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def compute_area(points, trim=0.01, margin_km=3.0):
+    """Bounds of the points between the trim and 1 - trim percentiles plus a margin"""
+    lats = sorted(lat for lat, _ in points)
+    lngs = sorted(lng for _, lng in points)
+    south, north = percentile(lats, trim), percentile(lats, 1 - trim)
+    west, east = percentile(lngs, trim), percentile(lngs, 1 - trim)
+
+    inside = [(lat, lng) for lat, lng in points if south <= lat <= north and west <= lng <= east]
+    centroid_lat = sum(lat for lat, _ in inside) / len(inside)
+    centroid_lng = sum(lng for _, lng in inside) / len(inside)
+
+    lat_margin = margin_km / KM_PER_DEGREE
+    lng_margin = margin_km / (KM_PER_DEGREE * max(math.cos(math.radians(centroid_lat)), 0.01))
+    return {
+        "bounds": {
+            "south": round(south - lat_margin, 6),
+            "west": round(west - lng_margin, 6),
+            "north": round(north + lat_margin, 6),
+            "east": round(east + lng_margin, 6)
+        },
+        "centroid": {"lat": round(centroid_lat, 6), "lng": round(centroid_lng, 6)},
+        "samples": len(points)
+    }
+
+def compute(args):
+    if not os.path.isdir(args.base):
+        print(f"No call directory at {args.base}", file=sys.stderr)
+        return 1
+
+    points = {}
+    for exten, lat, lng in iter_pickups(args.base, args.days):
+        points.setdefault(exten, []).append((lat, lng))
+
+    areas = load_service_areas(args.out)
+    updated = time.strftime('%Y-%m-%d %H:%M:%S')
+    for exten, exten_points in sorted(points.items()):
+        if len(exten_points) < args.min_samples:
+            print(f"{exten}: {len(exten_points)} pickups, need {args.min_samples}, kept previous area", file=sys.stderr)
+            continue
+        area = compute_area(exten_points, args.trim / 100.0, args.margin_km)
+        if args.country:
+            area["components"] = f"country:{args.country}"
+        area["updated"] = updated
+        areas[exten] = area
+        print(f"{exten}: {area['samples']} pickups, bounds {bounds_param(area)}")
+
+    temp_path = f"{args.out}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(areas, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, args.out)
+    return 0
+
+def main():
+    # Only the CLI needs argparse, the geocoder imports this module per call
+    import argparse
+    parser = argparse.ArgumentParser(description='Compute per-extension service areas from past pickups')
+    sub = parser.add_subparsers(dest='command')
+    compute_parser = sub.add_parser('compute')
+    compute_parser.add_argument('--base', default=CALLS_DIR)
+    compute_parser.add_argument('--out', default=SERVICE_AREAS_PATH)
+    compute_parser.add_argument('--margin-km', type=float, default=3.0)
+    compute_parser.add_argument('--trim', type=float, default=1.0, help='percent trimmed on each side')
+    compute_parser.add_argument('--min-samples', type=int, default=50)
+    compute_parser.add_argument('--days', type=int, default=None, help='only calls from the last N days')
+    compute_parser.add_argument('--country', default=None, help='ISO country code for the components filter')
+    show_parser = sub.add_parser('show')
+    show_parser.add_argument('exten', nargs='?')
+    args = parser.parse_args()
+
+    if args.command == 'compute':
+        return compute(args)
+    if args.command == 'show':
+        areas = load_service_areas()
+        if args.exten:
+            areas = areas.get(args.exten) or {}
+        print(json.dumps(areas, ensure_ascii=False, indent=2))
+        return 0
+    parser.print_usage(sys.stderr)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
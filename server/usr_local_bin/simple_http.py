@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Small stdlib HTTP client for the short-lived scripts.
+
+Importing requests costs ~100 ms per process before any work starts. This
+module covers the subset the scripts use (get/post, params, headers, json
+bodies, timeouts, raise_for_status, response.json()) on top of http.client,
+with the same names so call sites read the same. Session keeps one
+connection per host alive for the long-running servers.
+"""
+import json
+import socket
+import http.client
+from urllib.parse import urlsplit, urlencode
+
+DEFAULT_TIMEOUT = 30
+MAX_REDIRECTS = 5
+
+class RequestException(Exception):
+    """Base error for anything that went wrong with a request"""
+    pass
+
+class ConnectionError(RequestException):
+    pass
+
+class Timeout(RequestException):
+    pass
+
+class HTTPError(RequestException):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+class Response:
+    def __init__(self, url, status_code, reason, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    @property
+    def encoding(self):
+        content_type = self.headers.get('Content-Type', '')
+        for part in content_type.split(';')[1:]:
+            key, _, value = part.strip().partition('=')
+            if key.lower() == 'charset' and value:
+                return value.strip('"')
+        return 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content.decode(self.encoding))
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise HTTPError(f"{self.status_code} {self.reason} for url: {self.url}", response=self)
+
+def _build_url(url, params):
+    if not params:
+        return url
+    separator = '&' if '?' in url else '?'
+    return url + separator + urlencode(params)
+
+def _encode_body(headers, data, json_body):
+    if json_body is not None:
+        headers.setdefault('Content-Type', 'application/json')
+        return json.dumps(json_body, ensure_ascii=False).encode('utf-8')
+    if isinstance(data, dict):
+        headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        return urlencode(data).encode('utf-8')
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return data
+
+class Session:
+    """Keeps one connection per (scheme, host, port) open between requests"""
+
+    def __init__(self, keep_alive=True):
+        self.keep_alive = keep_alive
+        self.connections = {}
+
+    def _connection(self, scheme, netloc, timeout):
+        key = (scheme, netloc)
+        conn = self.connections.get(key)
+        if conn is None:
+            if scheme == 'https':
+                conn = http.client.HTTPSConnection(netloc, timeout=timeout)
+            elif scheme == 'http':
+                conn = http.client.HTTPConnection(netloc, timeout=timeout)
+            else:
+                raise RequestException(f"Unsupported URL scheme: {scheme}")
+            if self.keep_alive:
+                self.connections[key] = conn
+        else:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+        return key, conn
+
+    def _drop(self, key, conn):
+        conn.close()
+        self.connections.pop(key, None)
+
+    def _send(self, method, url, headers, body, timeout):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        headers = dict(headers)
+        headers.setdefault('Host', parts.netloc)
+        headers.setdefault('User-Agent', 'iqtaxi-agi')
+        headers.setdefault('Accept', '*/*')
+        headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+
+        # A kept-alive connection may have been closed by the server in the
+        # meantime, retry once on a fresh one in that case
+        for attempt in range(2):
+            key, conn = self._connection(parts.scheme, parts.netloc, timeout)
+            reused = conn.sock is not None
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                raw = conn.getresponse()
+                content = raw.read()
+            except socket.timeout as e:
+                self._drop(key, conn)
+                raise Timeout(f"Request to {url} timed out after {timeout}s") from e
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                self._drop(key, conn)
+                if reused and attempt == 0:
+                    continue
+                raise ConnectionError(f"Connection to {url} failed: {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                self._drop(key, conn)
+                raise ConnectionError(f"Connection to {url} failed: {e}") from e
+
+            if not self.keep_alive or raw.will_close:
+                self._drop(key, conn)
+            return Response(url, raw.status, raw.reason, raw.headers, content)
+
+    def request(self, method, url, params=None, headers=None, data=None, json=None,
+                timeout=DEFAULT_TIMEOUT, allow_redirects=True):
+        url = _build_url(url, params)
+        headers = dict(headers or {})
+        body = _encode_body(headers, data, json)
+
+        response = self._send(method, url, headers, body, timeout)
+        redirects = 0
+        while allow_redirects and response.status_code in (301, 302, 303, 307, 308):
+            location = response.headers.get('Location')
+            if not location or redirects >= MAX_REDIRECTS:
+                break
+            redirects += 1
+            if location.startswith('/'):
+                parts = urlsplit(url)
+                location = f"{parts.scheme}://{parts.netloc}{location}"
+            url = location
+            if response.status_code == 303 or (response.status_code in (301, 302) and method == 'POST'):
+                method, body = 'GET', None
+                headers.pop('Content-Type', None)
+            response = self._send(method, url, headers, body, timeout)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
+
+def request(method, url, **kwargs):
+    session = Session(keep_alive=False)
+    try:
+        return session.request(method, url, **kwargs)
+    finally:
+        session.close()
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
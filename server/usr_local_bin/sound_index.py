@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Index of the sound files the call flows play.
+
+"build" scans the sound directories and writes a compact JSON manifest:
+for every file its language, codec, sample rate, duration and SHA-256,
+plus a map from playback name (what is passed to Playback, without the
+extension) to the file Asterisk would pick. Files whose size and mtime are
+unchanged since the last build are not read again.
+
+The AGI loads the manifest once per process and checks prompts with a
+dict lookup instead of finding a missing or corrupt file at playback time;
+the durations tell how long a prompt keeps the caller busy.
+
+Usage: python3 sound_index.py build [root ...] [--out PATH]
+       python3 sound_index.py check <name> [lang]
+       python3 sound_index.py stats
+"""
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+
+INDEX_PATH = '/tmp/sound_index.json'
+ASTERISK_SOUNDS = '/var/lib/asterisk/sounds'
+DEFAULT_ROOTS = ['/var/sounds', f'{ASTERISK_SOUNDS}/custom']
+# The order Asterisk is most likely to pick when several formats exist
+FORMATS = ['wav', 'sln', 'sln16', 'ulaw', 'alaw', 'gsm', 'mp3']
+LANGUAGES = {'el', 'en', 'bg', 'de', 'fr', 'it', 'es', 'ru'}
+INDEX_VERSION = 1
+
+# Headerless Asterisk formats: (codec, sample rate, bytes per second)
+RAW_FORMATS = {
+    'sln': ('pcm_s16le', 8000, 16000),
+    'sln16': ('pcm_s16le', 16000, 32000),
+    'ulaw': ('pcm_mulaw', 8000, 8000),
+    'alaw': ('pcm_alaw', 8000, 8000),
+    'gsm': ('gsm', 8000, 1650),
+}
+WAV_CODECS = {1: 'pcm', 3: 'pcm_float', 6: 'pcm_alaw', 7: 'pcm_mulaw', 0x31: 'gsm_ms', 0xFFFE: 'pcm'}
+
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_RATES = [44100, 48000, 32000]
+
+def wav_info(data):
+    """{"codec", "rate", "channels", "durationMs"} from the RIFF chunks"""
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError("not a RIFF/WAVE file")
+    fmt = None
+    data_size = None
+    position = 12
+    while position + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack('<4sI', data[position:position + 8])
+        body = data[position + 8:position + 8 + chunk_size]
+        if chunk_id == b'fmt ' and len(body) >= 16:
+            fmt = struct.unpack('<HHIIHH', body[:16])
+        elif chunk_id == b'data':
+            # Recorders that never finished the header leave 0 or too much here
+            data_size = min(chunk_size, len(data) - position - 8) if chunk_size else len(data) - position - 8
+            break
+        position += 8 + chunk_size + (chunk_size & 1)
+    if fmt is None or data_size is None:
+        raise ValueError("missing fmt or data chunk")
+    tag, channels, rate, byte_rate, _, bits = fmt
+    if not data_size:
+        raise ValueError("no audio data")
+    codec = WAV_CODECS.get(tag, f"wav_{tag:#x}")
+    if codec == 'pcm':
+        codec = f"pcm_s{bits}le" if bits > 8 else "pcm_u8"
+    return {"codec": codec, "rate": rate, "channels": channels,
+            "durationMs": int(data_size * 1000 / byte_rate) if byte_rate else None}
+
+def mp3_info(data):
+    """{"codec", "rate", "channels", "durationMs"} from the first MPEG layer III frame"""
+    position = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        position = 10 + size + (10 if data[5] & 0x10 else 0)
+    limit = min(len(data) - 4, position + 65536)
+    while position < limit:
+        if data[position] == 0xFF and data[position + 1] & 0xE0 == 0xE0:
+            b1, b2, b3 = data[position + 1], data[position + 2], data[position + 3]
+            version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+            bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+            if version != 1 and layer == 1 and 0 < bitrate_index < 15 and rate_index < 3:
+                break
+        position += 1
+    else:
+        raise ValueError("no MPEG layer III frame")
+    mpeg1 = version == 3
+    rate = MP3_RATES[rate_index] // (1 if mpeg1 else 2 if version == 2 else 4)
+    bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    channels = 1 if b3 >> 6 == 3 else 2
+    samples_per_frame = 1152 if mpeg1 else 576
+
+    frames = None
+    side_info = (32 if channels == 2 else 17) if mpeg1 else (17 if channels == 2 else 9)
+    xing = position + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info') and struct.unpack('>I', data[xing + 4:xing + 8])[0] & 1:
+        frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+    elif data[position + 36:position + 40] == b'VBRI':
+        frames = struct.unpack('>I', data[position + 50:position + 54])[0]
+    if frames:
+        duration_ms = int(frames * samples_per_frame * 1000 / rate)
+    else:
+        duration_ms = int((len(data) - position) * 8 * 1000 / bitrate)
+    return {"codec": "mp3", "rate": rate, "channels": channels, "durationMs": duration_ms}
+
+def raw_info(data, extension):
+    codec, rate, bytes_per_second = RAW_FORMATS[extension]
+    if not data:
+        raise ValueError("no audio data")
+    return {"codec": codec, "rate": rate, "channels": 1, "durationMs": int(len(data) * 1000 / bytes_per_second)}
+
+def language_of(path):
+    """el from welcome_el.wav or from a .../el/... sounds directory"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for separator in ('_', '-'):
+        suffix = stem.rsplit(separator, 1)[-1].lower()
+        if suffix in LANGUAGES and suffix != stem.lower():
+            return suffix
+    for part in reversed(os.path.dirname(path).split(os.sep)):
+        if part.lower() in LANGUAGES:
+            return part.lower()
+    return None
+
+def describe(path, st):
+    """Manifest entry of one file, with "error" instead of audio fields when it is unreadable"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    entry = {"lang": language_of(path), "bytes": st.st_size, "mtime": st.st_mtime}
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        entry["sha256"] = hashlib.sha256(data).hexdigest()
+        if extension == 'wav':
+            entry.update(wav_info(data))
+        elif extension == 'mp3':
+            entry.update(mp3_info(data))
+        else:
+            entry.update(raw_info(data, extension))
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        entry["error"] = str(e)
+    return entry
+
+def playback_name(path):
+    """What Playback is given for path: relative to the Asterisk sounds, else absolute, never an extension"""
+    stem = os.path.splitext(path)[0]
+    if stem.startswith(ASTERISK_SOUNDS + os.sep):
+        return os.path.relpath(stem, ASTERISK_SOUNDS)
+    return stem
+
+def build(roots=None, previous=None):
+    """Scan roots and return the manifest, reusing entries of previous for unchanged files"""
+    roots = [os.path.abspath(root) for root in (roots or DEFAULT_ROOTS)]
+    old_files = (previous or {}).get('files') or {}
+    files = {}
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower().lstrip('.') not in FORMATS:
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                old = old_files.get(path)
+                if old and old.get("bytes") == st.st_size and old.get("mtime") == st.st_mtime:
+                    files[path] = old
+                else:
+                    files[path] = describe(path, st)
+
+    sounds = {}
+    rank = {fmt: index for index, fmt in enumerate(FORMATS)}
+    for path in sorted(files, key=lambda p: rank[os.path.splitext(p)[1].lower().lstrip('.')]):
+        if "error" not in files[path]:
+            sounds.setdefault(playback_name(path), path)
+    return {"version": INDEX_VERSION, "generated": int(time.time()), "roots": roots,
+            "files": files, "sounds": sounds}
+
+def load_manifest(path=INDEX_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == INDEX_VERSION else None
+
+def write_manifest(manifest, path=INDEX_PATH):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+class SoundIndex:
+    """Lookups into a loaded manifest; without one every prompt counts as present"""
+    _loaded = {}
+
+    def __init__(self, manifest=None):
+        self.manifest = manifest
+        self.files = (manifest or {}).get('files') or {}
+        self.sounds = (manifest or {}).get('sounds') or {}
+        self.roots = (manifest or {}).get('roots') or []
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        """Shared per process and reloaded only when the manifest file changes"""
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return cls()
+        cached = cls._loaded.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        index = cls(load_manifest(path))
+        cls._loaded[path] = (mtime, index)
+        return index
+
+    @property
+    def available(self):
+        return self.manifest is not None
+
+    def covers(self, name):
+        """True when name lies under one of the indexed roots"""
+        full = name if os.path.isabs(name) else os.path.join(ASTERISK_SOUNDS, name)
+        return any(full == root or full.startswith(root + os.sep) for root in self.roots)
+
+    def lookup(self, name, language=None):
+        """Manifest entry Asterisk would play for name, language directory first"""
+        if language and not os.path.isabs(name):
+            path = self.sounds.get(os.path.join(language, name))
+            if path:
+                return dict(self.files[path], path=path)
+        path = self.sounds.get(name)
+        return dict(self.files[path], path=path) if path else None
+
+    def missing(self, name, language=None):
+        """True only when the index covers name and has no playable file for it"""
+        return self.available and self.covers(name) and self.lookup(name, language) is None
+
+    def duration_ms(self, name, language=None):
+        entry = self.lookup(name, language)
+        return entry.get("durationMs") if entry else None
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Index the sound files played by the call flows")
+    parser.add_argument('command', choices=['build', 'check', 'stats'])
+    parser.add_argument('args', nargs='*', help="build: roots, check: name [lang]")
+    parser.add_argument('--out', default=INDEX_PATH, help="manifest path")
+    options = parser.parse_args()
+
+    if options.command == 'build':
+        started = time.time()
+        manifest = build(options.args or None, load_manifest(options.out))
+        write_manifest(manifest, options.out)
+        errors = {path: entry["error"] for path, entry in manifest["files"].items() if "error" in entry}
+        print(json.dumps({"files": len(manifest["files"]), "sounds": len(manifest["sounds"]),
+                          "errors": errors, "seconds": round(time.time() - started, 2)},
+                         ensure_ascii=False, indent=2))
+        sys.exit(1 if errors else 0)
+
+    index = SoundIndex.load(options.out)
+    if not index.available:
+        print(f"No sound index at {options.out}, run build first", file=sys.stderr)
+        sys.exit(1)
+    if options.command == 'check':
+        if not options.args:
+            parser.error("check needs a sound name")
+        entry = index.lookup(options.args[0], options.args[1] if len(options.args) > 1 else None)
+        print(json.dumps(entry, ensure_ascii=False))
+        sys.exit(0 if entry else 1)
+    codecs = {}
+    for entry in index.files.values():
+        codecs[entry.get("codec", "error")] = codecs.get(entry.get("codec", "error"), 0) + 1
+    print(json.dumps({"files": len(index.files), "sounds": len(index.sounds), "codecs": codecs,
+                      "roots": index.roots}, ensure_ascii=False))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Registry of named places answered without geocoding (airports, ports,
+stations, hospitals, hotels, "κέντρο" ...), read from special_places.json.
+
+Top-level keys are scopes: "*" for every extension, an extension number, or
+an extension name from config.json (case-insensitive). Each place has:
+
+    names         synonyms, matched case- and accent-insensitively
+    match         "contains" (a name appears as whole words in the query, default)
+                  or "exact" (the whole query is the name)
+    address       reported address, the caller's own words when omitted
+    locationType  reported location_type, default "ROOFTOP"
+    latLng        {"lat": ..., "lng": ...}
+    appliesTo     "pickup", "destination" or "both" (default)
+
+Names are indexed by their folded word sequence, so a lookup is a few dict
+lookups per query word however many places are registered. The compiled
+index is cached like location_rules.py.
+
+Usage: python3 special_places.py <exten> <pickup 1|0> <address...>
+       python3 special_places.py --compile
+"""
+import sys
+import json
+from text_index import split_words, phrase_key, load_compiled
+
+PLACES_PATH = '/usr/local/bin/special_places.json'
+COMPILED_PATH = '/tmp/special_places.marshal'
+CONFIG_PATH = '/usr/local/bin/config.json'
+
+def build_index(places):
+    """{"exact": {phrase: place}, "contains": {phrase: place}, "longest": words}"""
+    index = {'exact': {}, 'contains': {}, 'longest': 0}
+    for place in places or []:
+        lat_lng = place['latLng']
+        entry = {
+            'address': str(place.get('address', '')),
+            'locationType': str(place.get('locationType', 'ROOFTOP')),
+            'lat': float(lat_lng['lat']),
+            'lng': float(lat_lng['lng']),
+            'appliesTo': str(place.get('appliesTo', 'both')),
+        }
+        table = index['exact'] if place.get('match') == 'exact' else index['contains']
+        for name in place.get('names', []):
+            key = phrase_key(name)
+            if key:
+                table.setdefault(key, entry)
+                index['longest'] = max(index['longest'], key.count(' ') + 1)
+    return index
+
+def compile_places(data):
+    """Per-scope indexes, scope names lowercased so extension names match any case"""
+    return {str(scope).lower(): build_index(places) for scope, places in data.items()}
+
+def load_places(path=PLACES_PATH):
+    return load_compiled(path, COMPILED_PATH, compile_places)
+
+def _candidates(index, words):
+    """Places matching the query words, whole-query matches first, then longest names"""
+    full = ' '.join(words)
+    for table in (index['exact'], index['contains']):
+        if full in table:
+            yield table[full]
+    for count in range(min(index['longest'], len(words) - 1), 0, -1):
+        for start in range(len(words) - count + 1):
+            place = index['contains'].get(' '.join(words[start:start + count]))
+            if place is not None:
+                yield place
+
+def find_place(address_query, current_exten, config=None, pickup="1", path=PLACES_PATH):
+    """
+    Registered place for the query as the geocoder output dict
+    {"address", "location_type", "latLng"}, or None.
+    """
+    indexes = load_places(path)
+    if not indexes or not address_query:
+        return None
+
+    scopes = [str(current_exten)]
+    if config and current_exten in config:
+        scopes.append(str(config[current_exten].get('name', '')).lower())
+    scopes.append('*')
+
+    words = [word for word, _, _ in split_words(address_query)]
+    if not words:
+        return None
+    skip = 'destination' if pickup == "1" else 'pickup'
+
+    for scope in scopes:
+        index = indexes.get(scope)
+        if not index:
+            continue
+        for place in _candidates(index, words):
+            if place['appliesTo'] == skip:
+                continue
+            return {
+                "address": place['address'] or str(address_query),
+                "location_type": place['locationType'],
+                "latLng": {
+                    "lat": place['lat'],
+                    "lng": place['lng']
+                }
+            }
+    return None
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "--compile":
+        indexes = load_places()
+        if not indexes:
+            print(f"No places loaded from {PLACES_PATH}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps({scope: len(index['exact']) + len(index['contains'])
+                          for scope, index in indexes.items()}, ensure_ascii=False))
+        sys.exit(0)
+    if len(sys.argv) < 4:
+        print("Usage: python special_places.py <exten> <pickup 1|0> <address...> | --compile", file=sys.stderr)
+        sys.exit(1)
+    try:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = None
+    place = find_place(" ".join(sys.argv[3:]), sys.argv[1], config, sys.argv[2])
+    print(json.dumps(place, ensure_ascii=False, separators=(',', ':')) if place else "")
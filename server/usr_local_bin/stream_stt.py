@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Streaming STT: recognition runs while the caller is still speaking.
+
+"start" is launched in the background just before Record(), once the
+dialplan has removed what an earlier attempt left behind (see reset()). It
+waits for the recording file to appear, follows it as Asterisk writes it
+and sends the PCM as a chunked HTTP upload to the streaming recognizer
+(sttStream.url, answering {"text": ".."} once the upload ends). When
+Record() returns the dialplan runs "finish", which drops a <file>.done
+marker, waits for the transcript and prints it like send_to_google_stt.py
+would. If streaming is not configured or fails, "finish" falls back to
+send_to_google_stt.py on the complete file. "enabled" prints 1 when
+streaming is configured, so the dialplan only pays for "start" then and
+otherwise calls send_to_google_stt.py directly.
+
+The recognizer can also be fed from the EAGI audio descriptor (fd 3) with
+stream_fd(). Google's own streaming API is gRPC only, so the stream goes to
+an HTTP recognizer (the self-hosted one or bench/stub_servers.py).
+
+Config (per extension):
+    "sttStream": {"url": "http://188.245.212.246:2700/stt/stream", "finishTimeout": 5}
+
+Usage: python3 stream_stt.py <current_exten> start|finish <wav_file>
+       python3 stream_stt.py <current_exten> enabled
+"""
+import os
+import sys
+import json
+import time
+import select
+import struct
+import simple_http
+
+CHUNK_BYTES = 3200
+POLL_INTERVAL = 0.02
+# Record() may take this long to create the file after the prompt
+FILE_WAIT = 15
+# Longest recording (Record max 10s) plus the time the dialplan needs to finish
+MAX_SECONDS = 30
+DEFAULT_FINISH_TIMEOUT = 5
+EAGI_FD = 3
+
+class StreamError(Exception):
+    pass
+
+def stream_settings(extension_config):
+    """sttStream settings of the extension, None when streaming is off"""
+    settings = (extension_config or {}).get('sttStream') or {}
+    if not settings.get('url') or not settings.get('enabled', True):
+        return None
+    return settings
+
+def result_path(wav_file):
+    return wav_file + ".stream.json"
+
+def done_path(wav_file):
+    return wav_file + ".done"
+
+def read_wav_header(f):
+    """
+    Parse the RIFF header of a file that is still being written. Returns
+    (sample_rate, data_offset) or None when the header is not complete yet.
+    """
+    f.seek(0)
+    header = f.read(12)
+    if len(header) < 12:
+        return None
+    if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise StreamError("not a WAV file")
+    rate = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+        if chunk_id == b'data':
+            if rate is None:
+                raise StreamError("data chunk before fmt chunk")
+            return rate, f.tell()
+        body = f.read(size + (size & 1))
+        if len(body) < size:
+            return None
+        if chunk_id == b'fmt ':
+            channels, rate, _, _, bits = struct.unpack('<HIIHH', body[2:16])
+            if channels != 1 or bits != 16:
+                raise StreamError("only 16 bit mono recordings can be streamed")
+
+def follow_recording(wav_file, stopped, header):
+    """
+    Yield the PCM of wav_file as it grows until stopped() is true and the
+    end of the file has been read. header receives the sample rate.
+    """
+    deadline = time.time() + FILE_WAIT
+    while not os.path.exists(wav_file):
+        if stopped() or time.time() > deadline:
+            raise StreamError(f"{wav_file} was not created")
+        time.sleep(POLL_INTERVAL)
+
+    deadline = time.time() + MAX_SECONDS
+    with open(wav_file, 'rb') as f:
+        parsed = None
+        while parsed is None:
+            parsed = read_wav_header(f)
+            if parsed is None:
+                if stopped() or time.time() > deadline:
+                    raise StreamError(f"{wav_file} has no complete header")
+                time.sleep(POLL_INTERVAL)
+        header['rate'], offset = parsed
+        f.seek(offset)
+        # Keep whole samples in every chunk
+        pending = b''
+        while True:
+            # Check before reading so the last write is always picked up
+            finished = stopped() or time.time() > deadline
+            data = f.read(CHUNK_BYTES)
+            if data:
+                data = pending + data
+                cut = len(data) - (len(data) & 1)
+                pending = data[cut:]
+                if cut:
+                    yield data[:cut]
+                continue
+            if finished:
+                return
+            time.sleep(POLL_INTERVAL)
+
+def follow_fd(fd, stopped):
+    """
+    Yield the EAGI audio arriving on fd until stopped() is true. Audio
+    queued before streaming started (while the prompt played) is skipped.
+    """
+    while select.select([fd], [], [], 0)[0]:
+        if not os.read(fd, 65536):
+            return
+    deadline = time.time() + MAX_SECONDS
+    while not stopped() and time.time() < deadline:
+        if select.select([fd], [], [], POLL_INTERVAL)[0]:
+            data = os.read(fd, CHUNK_BYTES)
+            if not data:
+                return
+            yield data
+
+def recognize_stream(url, chunks, rate, timeout=30, session=None):
+    """Send the chunks as one chunked upload and return the transcript"""
+    client = session if session is not None else simple_http
+    response = client.post(url, params={"rate": rate, "lang": "el-GR"},
+                           headers={"Content-Type": f"audio/l16; rate={rate}"},
+                           data=chunks, timeout=timeout)
+    if response.status_code != 200:
+        raise StreamError(f"recognizer returned {response.status_code} - {response.text}")
+    return response.json().get("text", "")
+
+def stream_file(url, wav_file, stopped, timeout=30, session=None):
+    """Stream a recording that is being written. stopped() ends it"""
+    header = {}
+    chunks = follow_recording(wav_file, stopped, header)
+    # The rate is known once the header has been read, which the first chunk waits for
+    first = next(chunks, None)
+    if first is None:
+        return ""
+
+    def all_chunks():
+        yield first
+        for chunk in chunks:
+            yield chunk
+
+    return recognize_stream(url, all_chunks(), header['rate'], timeout, session)
+
+def stream_fd(url, stopped, rate=8000, fd=EAGI_FD, timeout=30, session=None):
+    """Stream the EAGI audio (8 kHz signed linear by default) until stopped()"""
+    return recognize_stream(url, follow_fd(fd, stopped), rate, timeout, session)
+
+def reset(wav_file):
+    """
+    Remove what an earlier attempt with the same file name left behind, so
+    the stream does not pick up the old recording or result. Must finish
+    before Record() starts; the dialplan does the same with rm -f.
+    """
+    for path in (wav_file, done_path(wav_file), result_path(wav_file)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def write_result(wav_file, result):
+    path = result_path(wav_file)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def start(extension_config, wav_file):
+    """Stream the recording until the .done marker appears and store the result"""
+    settings = stream_settings(extension_config)
+    if settings is None:
+        return
+    marker = done_path(wav_file)
+    started = time.time()
+    try:
+        text = stream_file(settings['url'], wav_file, lambda: os.path.exists(marker))
+        write_result(wav_file, {"ok": True, "text": text, "seconds": round(time.time() - started, 2)})
+    except (StreamError, simple_http.RequestException, ValueError, OSError) as e:
+        write_result(wav_file, {"ok": False, "error": str(e)})
+
+def finish(extension_config, wav_file):
+    with open(done_path(wav_file), 'w'):
+        pass
+    settings = stream_settings(extension_config)
+    if settings is not None:
+        deadline = time.time() + float(settings.get('finishTimeout', DEFAULT_FINISH_TIMEOUT))
+        path = result_path(wav_file)
+        while time.time() < deadline:
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        result = json.load(f)
+                except (OSError, ValueError):
+                    break
+                if result.get("ok"):
+                    return result.get("text", "")
+                print(f"Streaming STT failed: {result.get('error')}", file=sys.stderr)
+                break
+            time.sleep(POLL_INTERVAL)
+
+    # Streaming off or unavailable, recognize the finished recording
+    from send_to_google_stt import send_to_google_stt
+    return send_to_google_stt(extension_config.get('googleApiKey'), wav_file, extension_config)
+
+if __name__ == "__main__":
+    if not (len(sys.argv) == 4 and sys.argv[2] in ("start", "finish")
+            or len(sys.argv) == 3 and sys.argv[2] == "enabled"):
+        print("Usage: python stream_stt.py <current_exten> start|finish <wav_file>\n"
+              "       python stream_stt.py <current_exten> enabled", file=sys.stderr)
+        sys.exit(1)
+
+    current_exten, command = sys.argv[1:3]
+    try:
+        with open('/usr/local/bin/config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        if command == "enabled":
+            print("0", flush=True)
+        print(f"Error loading config file: {e}", file=sys.stderr)
+        sys.exit(1)
+    if command == "enabled":
+        print("1" if stream_settings(config.get(current_exten)) else "0", flush=True)
+        sys.exit(0)
+    if current_exten not in config:
+        print(f"Extension {current_exten} not found in config", file=sys.stderr)
+        sys.exit(1)
+
+    wav_file = sys.argv[3]
+    if command == "start":
+        start(config[current_exten], wav_file)
+    else:
+        print(finish(config[current_exten], wav_file), flush=True)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Hedged STT: Google and the self-hosted recognizer raced against each other.
+
+The primary provider gets the recording first. If it has not answered with
+a transcript after hedgeDelay seconds (or it failed or heard nothing), the
+secondary gets it too, and the first non-empty transcript wins. Every
+answer is recorded per provider in provider_stats.py (latency histogram,
+empty/error counts, wins); a provider still running when the race is
+decided is recorded then as cancelled or timed out.
+
+Config (per extension), used by send_to_google_stt.py and the AGI:
+    "sttHedge": {"primary": "google", "secondary": "selfhosted", "hedgeDelay": 1.5,
+                 "timeout": 30, "selfHostedUrl": "http://188.245.212.246:2700/stt"}
+
+Usage: python3 stt_hedge.py <current_exten> <wav_file>
+"""
+import sys
+import json
+import time
+import queue
+import threading
+import simple_http
+from send_to_google_stt import recognize_google
+from send_to_stt import recognize_self_hosted, SERVER_URL
+from audio_trim import load_for_stt
+from provider_stats import ProviderStats, Race
+
+DEFAULT_HEDGE_DELAY = 1.5
+DEFAULT_TIMEOUT = 30
+
+def google(extension_config, wav_file, timeout):
+    return recognize_google(extension_config.get('googleApiKey'), wav_file, extension_config, timeout)
+
+def selfhosted(extension_config, wav_file, timeout):
+    url = (extension_config.get('sttHedge') or {}).get('selfHostedUrl', SERVER_URL)
+    # Same trimming as the Google upload, the recognizer takes WAV
+    audio_bytes, _ = load_for_stt(wav_file, extension_config)
+    return recognize_self_hosted(wav_file, url, timeout, audio_bytes) or ""
+
+PROVIDERS = {
+    "google": google,
+    "selfhosted": selfhosted,
+}
+
+def recognize(extension_config, wav_file, stats=None):
+    """
+    First non-empty transcript of the hedged providers, "" when none had one
+    but at least one answered. Raises simple_http.RequestException when every
+    provider failed or timed out.
+    """
+    settings = extension_config.get('sttHedge') or {}
+    order = [settings.get('primary', 'google'), settings.get('secondary', 'selfhosted')]
+    order = [name for name in order if name in PROVIDERS]
+    if not order:
+        order = ['google']
+    hedge_delay = float(settings.get('hedgeDelay', DEFAULT_HEDGE_DELAY))
+    timeout = float(settings.get('timeout', DEFAULT_TIMEOUT))
+    stats = stats if stats is not None else ProviderStats('stt')
+    race = Race(stats)
+
+    answers = queue.Queue()
+
+    def run(name):
+        try:
+            text = PROVIDERS[name](extension_config, wav_file, timeout)
+            outcome = "ok" if text.strip() else "empty"
+            error = None
+        except Exception as e:
+            text, outcome, error = "", "error", e
+        race.answer(name, outcome)
+        answers.put((name, text, error))
+
+    def launch():
+        name = order[len(launched)]
+        launched.append(name)
+        race.start(name)
+        # Daemon threads: a slower provider does not keep the script alive
+        threading.Thread(target=run, args=(name,), daemon=True).start()
+
+    launched = []
+    launch()
+    started = time.time()
+    deadline = started + timeout
+    hedge_at = started + hedge_delay
+    errors = []
+    answered = 0
+    heard_nothing = False
+    while answered < len(launched):
+        can_hedge = len(launched) < len(order)
+        wait = (hedge_at if can_hedge else deadline) - time.time()
+        try:
+            name, text, error = answers.get(timeout=max(0, wait))
+        except queue.Empty:
+            if can_hedge:
+                launch()
+                continue
+            break
+        answered += 1
+        if text.strip():
+            stats.win(name)
+            race.end("cancelled")
+            return text
+        if error is not None:
+            errors.append(f"{name}: {error}")
+        else:
+            heard_nothing = True
+        # Nothing usable from this one, do not wait for the hedge delay
+        if len(launched) < len(order):
+            launch()
+
+    race.end("timeout")
+    if heard_nothing:
+        return ""
+    if answered < len(launched):
+        errors.append(f"no answer within {timeout:g}s")
+    raise simple_http.RequestException("; ".join(errors))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python stt_hedge.py <current_exten> <wav_file>", file=sys.stderr)
+        sys.exit(1)
+    with open('/usr/local/bin/config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    try:
+        print(recognize(config.get(sys.argv[1], {}), sys.argv[2]), flush=True)
+    except simple_http.RequestException as e:
+        print(f"Error: {e}", flush=True)
@@ -6,14 +6,89 @@ import requests
 import os
 import logging
 import base64
+import re
 import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from audio_trim import load_for_stt
+from audio_encode import encode_for_stt
+import stream_stt
+import stt_hedge
+import tts_providers
+import tts_templates
+from tts_cache import TTSCache, cache_key
+from sound_index import SoundIndex
 from datetime import datetime
 
+# A sentence ends at . ! ? or the Greek question mark ; followed by a space
+SENTENCE_END = re.compile(r'(?<=[.!?;])\s+')
+# Shorter pieces stay with the next sentence
+MIN_SENTENCE_CHARS = 8
+# A period after a word this short is an abbreviation ("Λεωφ.", "Αγ."), not an end
+MAX_ABBREVIATION_CHARS = 4
+
+def split_sentences(text):
+    """Sentences of text for chunked TTS, very short pieces merged into the next"""
+    sentences = []
+    pending = ""
+    for piece in SENTENCE_END.split(text.strip()):
+        pending = f"{pending} {piece}".strip()
+        last_word = pending.rsplit(None, 1)[-1]
+        abbreviation = (last_word.endswith('.') and last_word[:-1].isalpha()
+                        and len(last_word) - 1 <= MAX_ABBREVIATION_CHARS)
+        if len(pending) >= MIN_SENTENCE_CHARS and not abbreviation:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences and len(pending) < MIN_SENTENCE_CHARS:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+def read_agi_environment(agi_in):
+    """Read the agi_* header block Asterisk sends before the first command"""
+    agi_vars = {}
+    while True:
+        line = agi_in.readline().strip()
+        if line == '':
+            break
+        key, value = line.split(':', 1)
+        agi_vars[key.strip()] = value.strip()
+    return agi_vars
+
+class AGIHangup(Exception):
+    """Raised when the AGI channel goes away (caller hung up or socket closed)"""
+    pass
+
 class TaxiCallAGI:
-    def __init__(self):
-        self.agi_vars = {}
+    def __init__(self, agi_in=None, agi_out=None, config=None, http=None, agi_vars=None):
+        """
+        agi_in/agi_out default to stdin/stdout (classic AGI). The FastAGI server
+        passes the socket streams plus the already loaded config and a warm
+        requests.Session so nothing is re-read per call. agi_vars can be given
+        when the AGI environment was already read from the stream.
+        """
+        self.agi_vars = dict(agi_vars) if agi_vars is not None else {}
+        self.agi_in = agi_in if agi_in is not None else sys.stdin
+        self.agi_out = agi_out if agi_out is not None else sys.stdout
+        self.http = http if http is not None else requests
+        # The pool threads below get their own sessions, see thread_http()
+        self.call_thread = threading.current_thread()
+        self.pool_sessions = threading.local()
+        # Lookups that run while the caller listens to the next prompt, plus
+        # the streaming STT upload that runs while the caller speaks
+        self.background = ThreadPoolExecutor(max_workers=3)
+        # Sentences of a spoken text synthesized side by side
+        self.tts_workers = ThreadPoolExecutor(max_workers=4)
         self.setup_logging()
-        self.load_config()
+        if config is None:
+            self.load_config()
+        else:
+            self.config = config
+        self.tts_cache = TTSCache.from_settings(self.config.get('ttsCache'))
+        # Built by sound_index.py, loaded once per process
+        self.sounds = SoundIndex.load()
         self.setup_variables()
         
     def setup_logging(self):
@@ -36,12 +111,8 @@ class TaxiCallAGI:
     def setup_variables(self):
         """Setup AGI variables and file paths"""
         # Read AGI environment variables
-        while True:
-            line = sys.stdin.readline().strip()
-            if line == '':
-                break
-            key, value = line.split(':', 1)
-            self.agi_vars[key.strip()] = value.strip()
+        if not self.agi_vars:
+            self.agi_vars = read_agi_environment(self.agi_in)
         
         # Setup variables
         self.unique_id = self.agi_vars.get('agi_uniqueid', 'unknown')
@@ -57,8 +128,19 @@ class TaxiCallAGI:
         
     def agi_command(self, command):
         """Send AGI command and get response"""
-        print(command, flush=True)
-        response = sys.stdin.readline().strip()
+        try:
+            self.agi_out.write(command + "\n")
+            self.agi_out.flush()
+        except (BrokenPipeError, ConnectionError, ValueError):
+            raise AGIHangup(command)
+        response = self.agi_in.readline()
+        if not response:
+            # EOF - Asterisk closed the channel
+            raise AGIHangup(command)
+        response = response.strip()
+        if response.startswith("HANGUP"):
+            # FastAGI sends HANGUP when the caller drops
+            raise AGIHangup(command)
         logging.debug(f"{self.log_prefix} AGI Command: {command} | Response: {response}")
         return response
         
@@ -167,7 +249,7 @@ class TaxiCallAGI:
                 "language": "el-GR"
             }
             
-            response = requests.get(api_url, params=params, timeout=15)
+            response = self.thread_http().get(api_url, params=params, timeout=15)
             response.raise_for_status()
             data = response.json()
             
@@ -217,7 +299,7 @@ class TaxiCallAGI:
                 "Content-Type": "application/json; charset=UTF-8",
             }
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self.thread_http().get(url, headers=headers, timeout=30)
             response.raise_for_status()
             data = response.json()
             
@@ -259,25 +341,33 @@ class TaxiCallAGI:
                 
             if not os.path.exists(wav_file):
                 return ""
-            
-            with open(wav_file, "rb") as f:
-                audio_content = base64.b64encode(f.read()).decode("utf-8")
+
+            # With sttHedge the self-hosted recognizer is raced against Google
+            if self.config.get('sttHedge'):
+                return stt_hedge.recognize(self.config, wav_file)
+
+            audio_bytes, trim_stats = load_for_stt(wav_file, self.config)
+            if trim_stats:
+                self.log_message(f"STT trim: {trim_stats['originalMs']}ms -> {trim_stats['trimmedMs']}ms, "
+                                 f"{trim_stats['originalBytes']} -> {trim_stats['trimmedBytes']} bytes")
+            audio_bytes, audio_config = encode_for_stt(audio_bytes, self.config)
+            audio_content = base64.b64encode(audio_bytes).decode("utf-8")
             
             headers = {"Content-Type": "application/json"}
+            recognition_config = dict(audio_config)
+            recognition_config.update({
+                "languageCode": "el-GR",
+                "profanityFilter": True
+            })
             body = {
-                "config": {
-                    "encoding": "LINEAR16",
-                    "sampleRateHertz": 16000,
-                    "languageCode": "el-GR",
-                    "profanityFilter": True 
-                },
+                "config": recognition_config,
                 "audio": {
                     "content": audio_content
                 }
             }
             
             url = f"https://speech.googleapis.com/v1/speech:recognize?key={api_key}"
-            response = requests.post(url, headers=headers, data=json.dumps(body), timeout=30)
+            response = self.http.post(url, headers=headers, data=json.dumps(body), timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -345,7 +435,7 @@ class TaxiCallAGI:
                 "comments": "[ΑΥΤΟΜΑΤΟΠΟΙΗΜΕΝΗ ΚΛΗΣΗ]"
             }
             
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            response = self.http.post(url, headers=headers, json=payload, timeout=30)
             response.raise_for_status()
             result = response.json()
             
@@ -359,36 +449,173 @@ class TaxiCallAGI:
             return "Σφάλμα: Αποτυχία σύνδεσης με τον διακομιστή"
             
     def generate_tts(self, text, filename):
-        """Generate TTS audio file"""
+        """
+        Generate an MP3 through the hedged TTS providers (the self-hosted
+        engine first, Google when it is slow or fails and a key is set).
+        Repeated texts come from the TTS cache.
+        """
+        key = cache_key(text, "el", "agi", 0, "mp3")
+        if self.tts_cache.get(key, "mp3", filename):
+            return True
+        default_order = ("selfhosted", "google") if self.config.get('googleApiKey') else ("selfhosted",)
         try:
-            url = f"http://188.245.212.246:221/tts?text={text}&lang=el"
-            response = requests.get(url, timeout=30)
-            
-            if response.status_code == 200:
-                with open(filename, 'wb') as f:
-                    f.write(response.content)
-                return os.path.getsize(filename) > 100
-            return False
+            # No session: the providers race on threads of their own, the
+            # default client (simple_http) opens a connection per request
+            audio, provider = tts_providers.synthesize(self.config, text, "mp3", "el-GR", 0, default_order)
+            self.log_message(f"TTS by {provider}: {os.path.basename(filename)}")
+            with open(filename, 'wb') as f:
+                f.write(audio)
+            self.tts_cache.put(key, "mp3", filename)
+            return True
             
         except Exception as e:
             self.log_message(f"TTS error: {e}")
             return False
-            
+
+    def speak(self, text, base_path):
+        """
+        Play text through TTS. With ttsStreaming (on by default) every sentence
+        is synthesized at once and played as soon as it is ready, so the caller
+        hears the first sentence while the rest are still being synthesized.
+        If a sentence fails, that sentence and the ones after it are
+        synthesized and played in one piece, so nothing already heard is
+        repeated and nothing is skipped.
+        Returns True when the whole text was played.
+        """
+        sentences = split_sentences(text)
+        if len(sentences) < 2 or not self.config.get('ttsStreaming', True):
+            return self.generate_tts(text, f"{base_path}.mp3") and self.play(base_path)
+
+        futures = [self.tts_workers.submit(self.generate_tts, sentence, f"{base_path}_{index}.mp3")
+                   for index, sentence in enumerate(sentences)]
+        for index, future in enumerate(futures):
+            if not future.result():
+                self.log_message(f"TTS failed for sentence {index + 1}/{len(sentences)}, playing the rest in one piece")
+                for pending in futures[index + 1:]:
+                    pending.cancel()
+                rest = " ".join(sentences[index:])
+                return self.generate_tts(rest, f"{base_path}_rest.mp3") and self.play(f"{base_path}_rest")
+            if not self.play(f"{base_path}_{index}"):
+                return False
+        return True
+            
+    def play(self, sound):
+        """Playback, skipped with a log line when the sound index knows the file is missing or unreadable"""
+        if self.sounds.missing(sound):
+            self.log_message(f"Sound {sound} is missing from the sound index, not playing it")
+            return False
+        self.agi_command(f"EXEC Playback {sound}")
+        return True
+
+    def templates_enabled(self):
+        """Template prompts need the Google key, ttsTemplates turns them on"""
+        return bool(self.config.get('googleApiKey') and tts_templates.templates_enabled(self.config))
+
+    def render_prompt(self, name, slots, text, base_path):
+        """
+        Render a prompt from cached tts_templates.py fragments, or the whole
+        text through generate_tts when templates are off or fail. base_path
+        has no extension, Playback picks whichever file was written.
+        """
+        for stale in (f"{base_path}.wav", f"{base_path}.mp3"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        if self.templates_enabled():
+            try:
+                wav_path = tts_templates.render(self.config, name, slots, base_path, cache=self.tts_cache)
+                if wav_path and os.path.getsize(wav_path) > 100:
+                    return True
+            except Exception as e:
+                self.log_message(f"Template TTS error: {e}")
+        return self.generate_tts(text, f"{base_path}.mp3")
+
+    def thread_http(self):
+        """
+        HTTP client for the current thread. self.http may be the FastAGI
+        worker's requests.Session, which is not thread-safe, so jobs on the
+        worker pools get a session of their own per pool thread.
+        """
+        if self.http is requests or threading.current_thread() is self.call_thread:
+            return self.http
+        session = getattr(self.pool_sessions, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self.pool_sessions.session = session
+        return session
+
+    def start_background(self, func, *args):
+        """Run func(*args) on the call's worker threads, returns a Future"""
+        return self.background.submit(func, *args)
+
+    def wait_for(self, future):
+        """Result of a background lookup, with hold music only if it is still running"""
+        if not future.done():
+            self.agi_command("EXEC StartMusicOnHold")
+            try:
+                future.result()
+            finally:
+                self.agi_command("EXEC StopMusicOnHold")
+        return future.result()
+
+    def start_stt_stream(self, wav_file):
+        """
+        Start streaming the recording to the sttStream recognizer before Record
+        runs. Under EAGI the audio comes from fd 3 instead of the file.
+        Returns None when streaming is off.
+        """
+        settings = stream_stt.stream_settings(self.config)
+        if settings is None:
+            return None
+        stream_stt.reset(wav_file)
+        done = threading.Event()
+        if self.agi_vars.get('agi_enhanced', '0') != '0' and self.agi_in is sys.stdin:
+            rate = int(settings.get('eagiRate', 8000))
+            future = self.start_background(stream_stt.stream_fd, settings['url'], done.is_set, rate)
+        else:
+            future = self.start_background(stream_stt.stream_file, settings['url'], wav_file, done.is_set)
+        return future, done, float(settings.get('finishTimeout', stream_stt.DEFAULT_FINISH_TIMEOUT))
+
+    def finish_stt_stream(self, stream, wav_file):
+        """Transcript of a finished recording, from the stream when there is one"""
+        if stream is not None:
+            future, done, finish_timeout = stream
+            done.set()
+            try:
+                return future.result(timeout=finish_timeout)
+            except Exception as e:
+                self.log_message(f"Streaming STT failed, sending the recording: {e}")
+        return self.speech_to_text(wav_file)
+
+    def collect_pickup(self, progress_file):
+        """Ask for the pickup and geocode it in the foreground. Returns (text, location) or (None, None)"""
+        pickup_result = self.collect_data_with_retry("pickup", "custom/give-pickup-address-v2")
+        if not pickup_result:
+            return None, None
+        self.agi_command("EXEC StartMusicOnHold")
+        pickup_location = self.fetch_coordinates(pickup_result)
+        self.agi_command("EXEC StopMusicOnHold")
+        if not pickup_location:
+            return None, None
+        self.save_json("pickup", pickup_result, progress_file)
+        self.save_json("pickupLocation", pickup_location, progress_file)
+        return pickup_result, pickup_location
+
     def collect_data_with_retry(self, data_type, prompt_file, max_retries=3):
         """Generic function to collect data with retries"""
         for attempt in range(1, max_retries + 1):
             self.log_message(f"Collecting {data_type} - Attempt: {attempt}/{max_retries}")
             
             # Play prompt
-            self.agi_command(f"EXEC Playback {prompt_file}")
+            self.play(prompt_file)
             
             # Record response
             recording_file = f"{self.filebase}/recordings/{data_type}_{attempt}.wav16"
+            stream = self.start_stt_stream(recording_file)
             self.agi_command(f"EXEC Record {recording_file},2,10")
             
             # Convert to text
             self.agi_command("EXEC StartMusicOnHold")
-            text_result = self.speech_to_text(recording_file)
+            text_result = self.finish_stt_stream(stream, recording_file)
             self.agi_command("EXEC StopMusicOnHold")
             
             self.log_message(f"{data_type.capitalize()} STT result: {text_result}")
@@ -412,19 +639,24 @@ class TaxiCallAGI:
             # Check for anonymous calls
             if self.caller_id.lower() in ['anonymous', '', 'unknown']:
                 self.log_message("Anonymous call detected, transferring to operator")
-                self.agi_command("EXEC Playback custom/anonymous-v2")
+                self.play("custom/anonymous-v2")
                 self.agi_command("EXEC Dial SIP/10,20")
                 return
             
+            # Look the caller up while the welcome message plays
+            welcome_ms = self.sounds.duration_ms("custom/welcome-v2")
+            self.log_message("Checking for existing user data" +
+                             (f" during the {welcome_ms} ms welcome prompt" if welcome_ms else ""))
+            user_future = self.start_background(self.get_user_info, self.caller_id)
+            if self.templates_enabled():
+                # Static prompt fragments, only the first call renders them
+                self.start_background(tts_templates.prerender, self.config, "el-GR", 10, self.tts_cache)
+            
             # Play welcome message
             self.agi_command("EXEC Wait 1")
-            self.agi_command("EXEC Playback custom/welcome-v2")
+            self.play("custom/welcome-v2")
             
-            # Check for existing user data
-            self.log_message("Checking for existing user data")
-            self.agi_command("EXEC StartMusicOnHold")
-            user_data = self.get_user_info(self.caller_id)
-            self.agi_command("EXEC StopMusicOnHold")
+            user_data = self.wait_for(user_future)
             
             self.log_message(f"User data result: {json.dumps(user_data, ensure_ascii=False)}")
             
@@ -453,7 +685,7 @@ class TaxiCallAGI:
                 pickup_text = user_data["pickup"]
                 tts_text = f"Βρήκαμε μια προεπιλεγμένη διεύθυνση: {pickup_text}. Πατήστε 1 για να τη χρησιμοποιήσετε ή 2 για να δώσετε νέα διεύθυνση."
                 
-                if self.generate_tts(tts_text, f"{self.filebase}/user_prompt.mp3"):
+                if self.render_prompt("default_pickup", {"pickup": pickup_text}, tts_text, f"{self.filebase}/user_prompt"):
                     self.agi_command(f"EXEC Read USER_CHOICE,{self.filebase}/user_prompt,1,2,3,10")
                     choice = self.agi_command("GET VARIABLE USER_CHOICE").split('=')[1] if '=' in self.agi_command("GET VARIABLE USER_CHOICE") else ""
                     
@@ -465,22 +697,15 @@ class TaxiCallAGI:
                         }, ensure_ascii=False)
                         self.save_json("pickup", pickup_result, progress_file)
                         self.save_json("pickupLocation", pickup_location, progress_file)
-                        self.agi_command("EXEC Playback custom/confirm-default-address-v2")
+                        self.play("custom/confirm-default-address-v2")
             
+            # New pickup: geocode it in the background while the destination is collected
+            pickup_future = None
             if not pickup_result:
                 pickup_result = self.collect_data_with_retry("pickup", "custom/give-pickup-address-v2")
                 if pickup_result:
-                    # Get coordinates
-                    self.agi_command("EXEC StartMusicOnHold")
-                    pickup_location = self.fetch_coordinates(pickup_result)
-                    self.agi_command("EXEC StopMusicOnHold")
-                    
-                    if pickup_location:
-                        self.save_json("pickup", pickup_result, progress_file)
-                        self.save_json("pickupLocation", pickup_location, progress_file)
-                    else:
-                        self.handle_failure()
-                        return
+                    self.log_message(f"Geocoding pickup in background: {pickup_result}")
+                    pickup_future = self.start_background(self.fetch_coordinates, pickup_result)
                 else:
                     self.handle_failure()
                     return
@@ -503,6 +728,20 @@ class TaxiCallAGI:
                 self.handle_failure()
                 return
             
+            # Join the background pickup lookup, ask for the pickup again if it failed
+            if pickup_future is not None:
+                pickup_location = self.wait_for(pickup_future)
+                if pickup_location:
+                    self.save_json("pickup", pickup_result, progress_file)
+                    self.save_json("pickupLocation", pickup_location, progress_file)
+                else:
+                    self.log_message("Background pickup geocoding failed, collecting pickup again")
+                    self.play("custom/invalid_address")
+                    pickup_result, pickup_location = self.collect_pickup(progress_file)
+                    if not pickup_result:
+                        self.handle_failure()
+                        return
+            
             # Confirmation loop
             for confirm_attempt in range(1, 4):
                 self.log_message(f"Confirmation attempt: {confirm_attempt}/3")
@@ -510,8 +749,12 @@ class TaxiCallAGI:
                 # Generate confirmation TTS
                 confirm_text = f"Παρακαλώ επιβεβαιώστε. Όνομα: {name_result}. Παραλαβή: {pickup_result}. Προορισμός: {dest_result}"
                 
-                if self.generate_tts(confirm_text, f"{self.filebase}/confirm.mp3"):
-                    self.agi_command(f"EXEC Playback {self.filebase}/confirm")
+                confirm_slots = {"name": name_result, "pickup": pickup_result, "destination": dest_result}
+                if self.templates_enabled():
+                    if self.render_prompt("confirm", confirm_slots, confirm_text, f"{self.filebase}/confirm"):
+                        self.play(f"{self.filebase}/confirm")
+                else:
+                    self.speak(confirm_text, f"{self.filebase}/confirm")
                 
                 # Get user choice
                 self.agi_command("EXEC Read DTMF_OPTION,custom/options-v2,1,2,3,10")
@@ -525,8 +768,7 @@ class TaxiCallAGI:
                     reg_result = self.register_call()
                     self.agi_command("EXEC StopMusicOnHold")
                     
-                    if self.generate_tts(reg_result, f"{self.filebase}/register.mp3"):
-                        self.agi_command(f"EXEC Playback {self.filebase}/register")
+                    self.speak(reg_result, f"{self.filebase}/register")
                     
                     self.log_message("Call completed successfully")
                     return
@@ -541,18 +783,8 @@ class TaxiCallAGI:
                             self.handle_failure()
                             return
                     elif choice == "2":  # Pickup
-                        pickup_result = self.collect_data_with_retry("pickup", "custom/give-pickup-address-v2")
-                        if pickup_result:
-                            self.agi_command("EXEC StartMusicOnHold")
-                            pickup_location = self.fetch_coordinates(pickup_result)
-                            self.agi_command("EXEC StopMusicOnHold")
-                            if pickup_location:
-                                self.save_json("pickup", pickup_result, progress_file)
-                                self.save_json("pickupLocation", pickup_location, progress_file)
-                            else:
-                                self.handle_failure()
-                                return
-                        else:
+                        pickup_result, pickup_location = self.collect_pickup(progress_file)
+                        if not pickup_result:
                             self.handle_failure()
                             return
                     elif choice == "3":  # Destination
@@ -572,21 +804,30 @@ class TaxiCallAGI:
                             return
                 else:
                     # Invalid choice
-                    self.agi_command("EXEC Playback custom/invalid-v2")
+                    self.play("custom/invalid-v2")
                     continue
             
             # If we get here, confirmation failed
             self.handle_failure()
             
+        except AGIHangup:
+            self.log_message("Caller hung up")
         except Exception as e:
             self.log_message(f"Unexpected error: {e}")
             traceback.print_exc()
-            self.handle_failure()
+            try:
+                self.handle_failure()
+            except AGIHangup:
+                self.log_message("Caller hung up")
+        finally:
+            # Lookups still running after a hangup finish on their own
+            self.background.shutdown(wait=False)
+            self.tts_workers.shutdown(wait=False)
             
     def handle_failure(self):
         """Handle call failure"""
         self.log_message("Call failed - transferring to operator")
-        self.agi_command("EXEC Playback custom/invalid-v3")
+        self.play("custom/invalid-v3")
         self.agi_command("EXEC Dial SIP/10,20")
 
 if __name__ == "__main__":
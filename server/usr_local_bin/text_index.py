@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the address lookup tables (location_rules.py,
+special_places.py): case- and accent-folded word splitting that remembers
+source positions, and loading of a JSON data file compiled once into a
+marshal cache under /tmp that is reused until the JSON file changes.
+"""
+import os
+import json
+import marshal
+import unicodedata
+
+_fold_cache = {}
+_loaded = {}
+
+def fold_char(ch):
+    """Case- and accent-free form of one character (may be empty or longer)"""
+    folded = _fold_cache.get(ch)
+    if folded is None:
+        decomposed = unicodedata.normalize('NFD', ch)
+        folded = ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn').casefold()
+        if folded.isspace():
+            folded = ' '
+        _fold_cache[ch] = folded
+    return folded
+
+def fold_with_positions(text):
+    """Fold text and return (folded, positions) mapping each folded char to its source index"""
+    folded = []
+    positions = []
+    for index, ch in enumerate(text):
+        for f in fold_char(ch):
+            folded.append(f)
+            positions.append(index)
+    return ''.join(folded), positions
+
+def split_words(text):
+    """Folded words of text as (word, source_start, source_end) tuples"""
+    folded, positions = fold_with_positions(text)
+    words = []
+    start = None
+    for index, ch in enumerate(folded + ' '):
+        if ch.isalnum():
+            if start is None:
+                start = index
+        elif start is not None:
+            words.append((folded[start:index], positions[start], positions[index - 1] + 1))
+            start = None
+    return words
+
+def phrase_key(text):
+    """Folded words of text joined by single spaces, the key used by the indexes"""
+    return ' '.join(word for word, _, _ in split_words(text))
+
+def load_compiled(path, compiled_path, compile_data):
+    """
+    compile_data(json_data) for the file at path, from memory, the marshal
+    cache at compiled_path or the JSON itself. Returns {} when the file is
+    missing or invalid. The result must only hold marshal-able types.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+    source = (path, st.st_mtime_ns, st.st_size)
+    loaded = _loaded.get(compiled_path)
+    if loaded and loaded[0] == source:
+        return loaded[1]
+
+    compiled = None
+    try:
+        with open(compiled_path, 'rb') as f:
+            cached = marshal.load(f)
+        if cached.get('source') == source:
+            compiled = cached['data']
+    except (OSError, EOFError, ValueError, TypeError, AttributeError):
+        pass
+
+    if compiled is None:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                compiled = compile_data(json.load(f))
+        except (OSError, ValueError, AttributeError, TypeError, KeyError):
+            return {}
+        try:
+            temp_path = f"{compiled_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                marshal.dump({'source': source, 'data': compiled}, f)
+            os.replace(temp_path, compiled_path)
+        except (OSError, ValueError):
+            pass
+
+    _loaded[compiled_path] = (source, compiled)
+    return compiled
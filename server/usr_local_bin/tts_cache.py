@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of rendered TTS prompts.
+
+Files are stored under /tmp/tts_cache/<aa>/<sha256>.<ext>, where the hash
+covers everything that changes the audio: text, language, voice, gain and
+output format (plus RENDER_VERSION, bumped whenever the rendering itself
+changes). A hit is copied to the output path, so neither the TTS request
+nor the WAV processing runs. Writes go through a temporary file and
+os.replace; when the cache grows past maxMb the least recently used files
+are removed.
+
+Usage: python3 tts_cache.py [stats|clear|evict]
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import threading
+
+CACHE_DIR = '/tmp/tts_cache'
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# Evict down to this share of the limit so not every put has to evict
+EVICT_TARGET = 0.9
+# Part of every key, change it when the rendered audio changes for the same input
+RENDER_VERSION = 2
+
+def cache_key(text, language_code, voice_name, gain, output_format):
+    parts = [RENDER_VERSION, text, language_code, voice_name or "", float(gain), output_format]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class TTSCache:
+    def __init__(self, path=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    @classmethod
+    def for_extension(cls, config, current_exten):
+        """Build a cache using the optional ttsCache settings of the extension"""
+        extension_config = config.get(current_exten) if config else None
+        return cls.from_settings((extension_config or {}).get('ttsCache'))
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a cache from a ttsCache dict, None means the defaults"""
+        settings = settings or {}
+        return cls(max_bytes=int(float(settings.get('maxMb', DEFAULT_MAX_BYTES / 1048576)) * 1048576),
+                   enabled=settings.get('enabled', True))
+
+    def file_path(self, key, extension):
+        return os.path.join(self.path, key[:2], f"{key}.{extension}")
+
+    def get(self, key, extension, output_path):
+        """Copy a cached file to output_path. True on a hit"""
+        if not self.enabled:
+            return False
+        cached = self.file_path(key, extension)
+        temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(cached, temp_path)
+            os.replace(temp_path, output_path)
+            # Recently used files are evicted last
+            os.utime(cached)
+            return True
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def put(self, key, extension, source_path):
+        """Store a copy of source_path, failures only mean a later miss"""
+        if not self.enabled:
+            return
+        cached = self.file_path(key, extension)
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            temp_path = f"{cached}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, cached)
+            self.evict()
+        except OSError:
+            pass
+
+    def entries(self):
+        """(mtime, size, path) of every cached file"""
+        result = []
+        if not os.path.isdir(self.path):
+            return result
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                result.append((st.st_mtime, st.st_size, entry.path))
+        return result
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        entries = self.entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries), "maxBytes": self.max_bytes}
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = TTSCache()
+    if command == "clear":
+        cache.clear()
+    elif command == "evict":
+        print(f"Removed {cache.evict()} files", file=sys.stderr)
+    elif command != "stats":
+        print("Usage: python tts_cache.py [stats|clear|evict]", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(cache.stats(), ensure_ascii=False))
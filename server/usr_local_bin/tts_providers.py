@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Pluggable TTS providers raced against each other.
+
+Providers:
+    google      Google Cloud TTS (googleTtsApiKey or googleApiKey)
+    selfhosted  the self-hosted engine, GET <selfHostedUrl>?text=..&lang=el, MP3 only
+    edge        Edge neural voices through an OpenAI-style speech endpoint
+                (e.g. an openai-edge-tts container), POST <edgeUrl>
+
+The first provider in "order" gets the text. If it has no audio after
+hedgeDelay seconds the next one gets it too, and so on; a provider that
+fails hands over at once. The first audio wins. hedgeDelay 0 races all of
+them from the start. Providers that cannot produce the requested format
+are left out of the race. Latency, failures and wins per provider are
+recorded in provider_stats.py under the kind "tts", a provider still running
+when the race is decided as cancelled or timed out.
+
+Config (per extension), used by the AGI and send_to_google_tts.py:
+    "ttsProviders": {"order": ["selfhosted", "google"], "hedgeDelay": 1.5, "timeout": 10,
+                     "selfHostedUrl": "http://188.245.212.246:221/tts",
+                     "edgeUrl": "http://127.0.0.1:5050/v1/audio/speech", "edgeVoice": "el-GR-AthinaNeural"}
+
+Usage: python3 tts_providers.py <current_exten> <text> <output_file.mp3|.wav>
+"""
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import simple_http
+from send_to_google_tts import request_audio, WAV_RATE
+from pcm_audio import read_wav, wav_bytes, resample
+from provider_stats import ProviderStats, Race
+
+SELF_HOSTED_URL = "http://188.245.212.246:221/tts"
+EDGE_URL = "http://127.0.0.1:5050/v1/audio/speech"
+EDGE_VOICES = {"el": "el-GR-AthinaNeural", "en": "en-US-AriaNeural", "bg": "bg-BG-KalinaNeural"}
+DEFAULT_HEDGE_DELAY = 1.5
+DEFAULT_TIMEOUT = 10
+# Anything shorter is an error page or an empty answer, not speech
+MIN_AUDIO_BYTES = 100
+
+def google(extension_config, text, audio_format, language_code, gain, timeout, http):
+    api_key = extension_config.get('googleTtsApiKey') or extension_config.get('googleApiKey')
+    if not api_key:
+        raise ValueError("no Google API key")
+    audio = request_audio(api_key, text, language_code, audio_format, gain, None, timeout)
+    if audio is None:
+        raise simple_http.RequestException("Google TTS request failed")
+    return audio[audio_format]
+
+def selfhosted(extension_config, text, audio_format, language_code, gain, timeout, http):
+    if audio_format != "mp3":
+        raise ValueError("the self-hosted engine only returns MP3")
+    url = (extension_config.get('ttsProviders') or {}).get('selfHostedUrl', SELF_HOSTED_URL)
+    # params are URL-encoded, the text may contain &, # or spaces
+    response = http.get(url, params={"text": text, "lang": language_code.split('-')[0]}, timeout=timeout)
+    if response.status_code != 200:
+        raise simple_http.HTTPError(f"{response.status_code} - {response.text[:200]}", response=response)
+    return response.content
+
+def edge(extension_config, text, audio_format, language_code, gain, timeout, http):
+    settings = extension_config.get('ttsProviders') or {}
+    language = language_code.split('-')[0]
+    voice = settings.get('edgeVoice') or EDGE_VOICES.get(language, EDGE_VOICES["el"])
+    headers = {"Content-Type": "application/json"}
+    if settings.get('edgeApiKey'):
+        headers["Authorization"] = f"Bearer {settings['edgeApiKey']}"
+    body = {"model": "tts-1", "input": text, "voice": voice, "response_format": audio_format, "speed": 1.0}
+    response = http.post(settings.get('edgeUrl', EDGE_URL), headers=headers, json=body, timeout=timeout)
+    if response.status_code != 200:
+        raise simple_http.HTTPError(f"{response.status_code} - {response.text[:200]}", response=response)
+    if audio_format == "mp3":
+        return response.content
+    # Edge voices are 24 kHz, Asterisk plays 8 kHz
+    pcm, rate = read_wav(response.content)
+    return wav_bytes(resample(pcm, rate, WAV_RATE), WAV_RATE)
+
+PROVIDERS = {
+    "google": google,
+    "selfhosted": selfhosted,
+    "edge": edge,
+}
+# Audio formats each provider can return
+FORMATS = {
+    "google": ("mp3", "wav"),
+    "selfhosted": ("mp3",),
+    "edge": ("mp3", "wav"),
+}
+
+def provider_order(extension_config, default_order=("google",)):
+    settings = extension_config.get('ttsProviders') or {}
+    order = [name for name in settings.get('order', default_order) if name in PROVIDERS]
+    return order or list(default_order)
+
+def render_with(extension_config, name, text, audio_format="mp3", language_code="el-GR", gain=0, http=None):
+    """Audio of one named provider without a race, e.g. a second format from the winner"""
+    settings = extension_config.get('ttsProviders') or {}
+    timeout = float(settings.get('timeout', DEFAULT_TIMEOUT))
+    http = http if http is not None else simple_http
+    audio = PROVIDERS[name](extension_config, text, audio_format, language_code, gain, timeout, http)
+    if not audio or len(audio) <= MIN_AUDIO_BYTES:
+        raise simple_http.RequestException(f"{name}: no audio in the answer")
+    return audio
+
+def synthesize(extension_config, text, audio_format="mp3", language_code="el-GR", gain=0,
+               default_order=("google",), http=None, stats=None):
+    """
+    Audio of the first hedged provider with an answer, as (audio_bytes,
+    provider_name). audio_format is "mp3" or "wav" (8 kHz, 16 bit mono).
+    Raises simple_http.RequestException when every provider failed or the
+    timeout passed, or none of them returns audio_format.
+    """
+    settings = extension_config.get('ttsProviders') or {}
+    order = [name for name in provider_order(extension_config, default_order)
+             if audio_format in FORMATS[name]]
+    if not order:
+        raise simple_http.RequestException(f"no TTS provider returns {audio_format}")
+    hedge_delay = float(settings.get('hedgeDelay', DEFAULT_HEDGE_DELAY))
+    timeout = float(settings.get('timeout', DEFAULT_TIMEOUT))
+    http = http if http is not None else simple_http
+    stats = stats if stats is not None else ProviderStats('tts')
+    race = Race(stats)
+
+    answers = queue.Queue()
+
+    def run(name):
+        try:
+            audio = PROVIDERS[name](extension_config, text, audio_format, language_code, gain, timeout, http)
+            error = None if audio and len(audio) > MIN_AUDIO_BYTES else ValueError("no audio in the answer")
+        except Exception as e:
+            audio, error = None, e
+        race.answer(name, "ok" if error is None else "error")
+        answers.put((name, audio, error))
+
+    def launch():
+        name = order[len(launched)]
+        launched.append(name)
+        race.start(name)
+        # Daemon threads: a slower provider does not keep the script alive
+        threading.Thread(target=run, args=(name,), daemon=True).start()
+
+    launched = []
+    launch()
+    started = time.time()
+    deadline = started + timeout
+    hedge_at = started + hedge_delay
+    errors = []
+    answered = 0
+    while answered < len(launched):
+        can_hedge = len(launched) < len(order)
+        wait = (min(hedge_at, deadline) if can_hedge else deadline) - time.time()
+        try:
+            name, audio, error = answers.get(timeout=max(0, wait))
+        except queue.Empty:
+            if can_hedge and time.time() < deadline:
+                launch()
+                hedge_at = time.time() + hedge_delay
+                continue
+            break
+        answered += 1
+        if error is None:
+            stats.win(name)
+            race.end("cancelled")
+            return audio, name
+        errors.append(f"{name}: {error}")
+        # This one is out, do not wait for the hedge delay
+        if len(launched) < len(order):
+            launch()
+            hedge_at = time.time() + hedge_delay
+
+    race.end("timeout")
+    if answered < len(launched):
+        errors.append(f"no answer within {timeout:g}s")
+    raise simple_http.RequestException("; ".join(errors))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python tts_providers.py <current_exten> <text> <output_file.mp3|.wav>", file=sys.stderr)
+        sys.exit(1)
+    with open('/usr/local/bin/config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    output_file = sys.argv[3]
+    audio_format = "wav" if output_file.endswith(".wav") else "mp3"
+    try:
+        audio, provider = synthesize(config.get(sys.argv[1], {}), sys.argv[2], audio_format,
+                                     default_order=("google", "selfhosted"))
+    except simple_http.RequestException as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    temp_path = f"{output_file}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(audio)
+    os.replace(temp_path, output_file)
+    print(f"Audio file saved: {output_file} ({provider})", flush=True)
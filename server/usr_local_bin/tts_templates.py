@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Prompt templates rendered from cached fragments.
+
+A template such as "Παρακαλώ επιβεβαιώστε. Όνομα: {name}. ..." is split into
+its static text and its slots. Static fragments are the same for every call
+of an extension and language, so after the first call (or "prerender") they
+come from the TTS cache; only the slot values are synthesized, all fragments
+in parallel and through the same cache. The 8 kHz PCM of the pieces is then
+joined, with a short pause between them, into one WAV.
+
+Templates are opt-in per extension, and can be overridden or added there:
+    "ttsTemplates": {"enabled": true, "gapMs": 120, "templates": {"confirm": "..."}}
+"enabled" prints 1 when they are on (ttsTemplates set and a Google key),
+the dialplan asks once per call and otherwise keeps send_to_google_tts.py.
+
+Usage: python3 tts_templates.py render <current_exten> <template> <output_base_path> [lang] [gain] [slot=value ...]
+       python3 tts_templates.py prerender <current_exten> [lang] [gain]
+       python3 tts_templates.py enabled <current_exten>
+"""
+import os
+import sys
+import json
+import shutil
+import string
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from send_to_google_tts import synthesize_to_files
+from tts_cache import TTSCache
+from pcm_audio import read_wav, write_wav, concat
+
+TEMPLATES = {
+    "default_pickup": "Βρήκαμε μια προεπιλεγμένη διεύθυνση: {pickup}. Πατήστε 1 για να τη χρησιμοποιήσετε ή 2 για να δώσετε νέα διεύθυνση.",
+    "confirm": "Παρακαλώ επιβεβαιώστε. Όνομα: {name}. Παραλαβή: {pickup}. Προορισμός: {destination}",
+    "confirm_address": "Παρακαλώ επιβεβαιώστε. Όνομα: {name}. Παραλαβή: {pickup}({pickup_address}). Προορισμός: {destination}",
+}
+DEFAULT_GAP_MS = 120
+MAX_WORKERS = 4
+# Left over between slots and not worth a request of their own
+PUNCTUATION = " .,:;()!?·-"
+
+def template_settings(extension_config):
+    return (extension_config or {}).get('ttsTemplates') or {}
+
+def templates_enabled(extension_config):
+    """Off unless the extension has ttsTemplates, which can still turn them off with "enabled": false"""
+    settings = template_settings(extension_config)
+    return bool(settings) and bool(settings.get('enabled', True))
+
+def get_template(extension_config, name):
+    custom = template_settings(extension_config).get('templates') or {}
+    return custom.get(name) or TEMPLATES.get(name)
+
+def split_template(template):
+    """[(kind, text)] with kind "static" or "slot", leading punctuation dropped"""
+    pieces = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        literal = literal.lstrip(PUNCTUATION).rstrip()
+        if literal:
+            pieces.append(("static", literal))
+        if field:
+            pieces.append(("slot", field))
+    return pieces
+
+def fill_template(template, slots):
+    """The whole prompt as one text, used when fragments cannot be rendered"""
+    return string.Formatter().vformat(template, (), _Slots(slots))
+
+class _Slots(dict):
+    def __missing__(self, key):
+        return ""
+
+def render_fragment(api_key, text, work_dir, index, language_code, gain, cache):
+    base_path = os.path.join(work_dir, f"fragment_{index}")
+    saved = synthesize_to_files(api_key, text, base_path, language_code, gain, "wav", cache)
+    if not saved:
+        raise RuntimeError(f"TTS failed for fragment {text!r}")
+    with open(f"{base_path}.wav", 'rb') as f:
+        return read_wav(f.read())
+
+def render_template(api_key, template, slots, output_base_path, language_code="el-GR", gain=10,
+                    cache=None, gap_ms=DEFAULT_GAP_MS):
+    """
+    Render template with slots into output_base_path.wav. Returns the path,
+    or raises when a fragment could not be synthesized.
+    """
+    texts = []
+    for kind, text in split_template(template):
+        value = text if kind == "static" else str(slots.get(text, "")).strip()
+        if value.strip(PUNCTUATION):
+            texts.append(value)
+
+    work_dir = tempfile.mkdtemp(prefix="tts_fragments_")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = [pool.submit(render_fragment, api_key, text, work_dir, index, language_code, gain, cache)
+                       for index, text in enumerate(texts)]
+            fragments = [future.result() for future in futures]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    rates = {rate for _, rate in fragments}
+    if len(rates) != 1:
+        raise RuntimeError(f"fragments have different sample rates: {sorted(rates)}")
+    rate = rates.pop()
+    wav_path = f"{output_base_path}.wav"
+    write_wav(wav_path, concat([pcm for pcm, _ in fragments], rate, gap_ms), rate)
+    return wav_path
+
+def render(extension_config, name, slots, output_base_path, language_code="el-GR", gain=10, cache=None):
+    """
+    Render a named template for an extension. Falls back to one request for
+    the whole text when templates are off or a fragment fails. Returns the
+    saved WAV path or None.
+    """
+    api_key = extension_config.get('googleTtsApiKey') or extension_config.get('googleApiKey')
+    template = get_template(extension_config, name)
+    if not api_key or not template:
+        return None
+    if templates_enabled(extension_config):
+        try:
+            gap_ms = int(template_settings(extension_config).get('gapMs', DEFAULT_GAP_MS))
+            return render_template(api_key, template, slots, output_base_path, language_code, gain, cache, gap_ms)
+        except Exception:
+            traceback.print_exc()
+    saved = synthesize_to_files(api_key, fill_template(template, slots), output_base_path,
+                                language_code, gain, "wav", cache)
+    return saved[0] if saved else None
+
+def prerender(extension_config, language_code="el-GR", gain=10, cache=None):
+    """Put the static fragments of every template into the cache. Returns how many were rendered"""
+    api_key = extension_config.get('googleTtsApiKey') or extension_config.get('googleApiKey')
+    names = set(TEMPLATES) | set((template_settings(extension_config).get('templates') or {}))
+    texts = sorted({text for name in names
+                    for kind, text in split_template(get_template(extension_config, name))
+                    if kind == "static"})
+    work_dir = tempfile.mkdtemp(prefix="tts_fragments_")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = [pool.submit(render_fragment, api_key, text, work_dir, index, language_code, gain, cache)
+                       for index, text in enumerate(texts)]
+            for future in futures:
+                future.result()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return len(texts)
+
+def parse_slots(args):
+    slots = {}
+    for arg in args:
+        key, _, value = arg.partition('=')
+        slots[key] = value
+    return slots
+
+if __name__ == "__main__":
+    usage = ("Usage: python tts_templates.py render <current_exten> <template> <output_base_path> [lang] [gain] [slot=value ...]\n"
+             "       python tts_templates.py prerender <current_exten> [lang] [gain]\n"
+             "       python tts_templates.py enabled <current_exten>")
+    if len(sys.argv) < 3 or sys.argv[1] not in ("render", "prerender", "enabled"):
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+    command, current_exten = sys.argv[1], sys.argv[2]
+    with open('/usr/local/bin/config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if command == "enabled":
+        extension_config = config.get(current_exten) or {}
+        api_key = extension_config.get('googleTtsApiKey') or extension_config.get('googleApiKey')
+        print("1" if api_key and templates_enabled(extension_config) else "0", flush=True)
+        sys.exit(0)
+    if current_exten not in config:
+        print(f"Extension {current_exten} not found in config", file=sys.stderr)
+        sys.exit(1)
+    extension_config = config[current_exten]
+    cache = TTSCache.for_extension(config, current_exten)
+
+    if command == "prerender":
+        language_code = sys.argv[3] if len(sys.argv) > 3 else "el-GR"
+        gain = float(sys.argv[4]) if len(sys.argv) > 4 else 10
+        print(f"Rendered {prerender(extension_config, language_code, gain, cache)} static fragments", flush=True)
+        sys.exit(0)
+
+    if len(sys.argv) < 5:
+        print(usage, file=sys.stderr)
+        sys.exit(1)
+    name, output_base_path = sys.argv[3], sys.argv[4]
+    # lang and gain are positional, slots are recognized by their "="
+    rest = sys.argv[5:]
+    positional = []
+    while rest and len(positional) < 2 and '=' not in rest[0]:
+        positional.append(rest.pop(0))
+    language_code = positional[0] if len(positional) > 0 else "el-GR"
+    gain = float(positional[1]) if len(positional) > 1 else 10
+    slots = parse_slots(rest)
+
+    wav_path = render(extension_config, name, slots, output_base_path, language_code, gain, cache)
+    if wav_path:
+        print(f"Audio files saved: {wav_path}", flush=True)
+    else:
+        print("Error: Failed to render prompt", file=sys.stderr)
+        sys.exit(1)
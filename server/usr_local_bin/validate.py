@@ -54,31 +54,39 @@ def is_valid_string(value):
         return 0
     return 1
 
-if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        # Read from stdin
-        try:
-            value = sys.stdin.read().strip()
-        except:
-            print(0)
-            sys.exit(1)
-    elif len(sys.argv) == 2:
-        value = sys.argv[1]
-    elif len(sys.argv) == 3:
-        value = sys.argv[2]
+def run(args):
+    """Script entry point without side effects on stdout. Returns (stdout, stderr, exit_code)"""
+    if len(args) == 1:
+        value = args[0]
+    elif len(args) == 2:
+        value = args[1]
     else:
-        print(0)
-        sys.exit(1)
-    
+        return "0\n", "", 1
+
     # First try JSON validation
     result = is_valid_json(value)
-    
+
     if result == 0:
         # Fall back to string validation
         result = is_valid_string(value)
-        
+
     if result == -1:
         result = 0
-        
-    print(result)
-    sys.exit(0)
\ No newline at end of file
+
+    return f"{result}\n", "", 0
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) == 0:
+        # Read from stdin
+        try:
+            args = [sys.stdin.read().strip()]
+        except:
+            print(0)
+            sys.exit(1)
+
+    import helper_client
+    result = helper_client.call("validate", args)
+    if result is None:
+        result = run(args)
+    helper_client.emit(result)